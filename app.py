@@ -1,441 +1,328 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, g, jsonify, Response, stream_with_context
 import sqlite3
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import click
+import csv
+import hashlib
+import heapq
+import io
+import json
+import math
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import date, datetime, timedelta
+import chart_cache
+import charts
 import database
-
-# Initialize the database
-database.init_db()
+import instrumentation
+import jobs
+import read_cache
+import render_service
+import scoring
+import series
 
 # Create a Flask application
 app = Flask(__name__)
 app.secret_key = '200220051805200528102005'  # Set the secret key for session management
+app.config['DATABASE'] = database.DATABASE  # Path of the SQLite database file; created and migrated on first use
+app.config['CHART_FOLDER'] = '/home/budgetbadgersite/Mini-IT-TC4L-Group-7/static/images'  # Rendered charts, one folder per user
+app.config['MAX_CACHED_CHART_USERS'] = 500  # Chart folders kept before the least recently viewed are evicted
+app.config['CHART_RENDER_WORKERS'] = 2  # Chart render processes; 0 renders inline
+app.config['CHART_PRESET'] = 'full'  # Size/DPI preset from charts.PRESETS ('full' or 'thumbnail')
+app.config['CHART_FORMAT'] = 'png'  # 'png', or 'svg' for vector charts
+app.config['TRANSACTIONS_PER_PAGE'] = 50  # Rows per page of the transaction history
+app.config['IMPORT_CHUNK_SIZE'] = 1000  # Rows inserted per transaction by the CSV import
+app.config['IMPORT_MAX_REPORTED_ERRORS'] = 100  # Row errors listed in an import report; the rest are only counted
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Largest accepted request body (CSV uploads)
+app.config['LEADERBOARD_CACHE_TTL'] = 30  # Seconds a cached leaderboard read is served before requerying
+app.config['LEADERBOARD_CACHE_SIZE'] = 1024  # Cached leaderboards kept (the global one plus one per follower)
+app.config['USER_SEARCH_LIMIT'] = 10  # Usernames returned per search
+app.config['USER_SEARCH_CACHE_TTL'] = 60  # Seconds a search result is cached
+app.config['USER_SEARCH_CACHE_SIZE'] = 4096  # Cached search queries
+app.config['REQUEST_TIMING'] = True  # Server-Timing header and a JSON log line per request (see instrumentation.py)
+app.config['SLOW_QUERY_MS'] = None  # Log statements slower than this many ms with their query plan; None disables
+app.config['JOBS_INLINE'] = False  # Run queued rescoring jobs at the end of the request instead of in `flask run-jobs`
+
+# Leaderboard reads, invalidated through the shared 'leaderboard' cache version (see leaderboard_version).
+leaderboard_cache = read_cache.TTLCache(app.config['LEADERBOARD_CACHE_SIZE'], app.config['LEADERBOARD_CACHE_TTL'])
+# Username search results by lowercased query, invalidated with bump() when a user signs up.
+user_search_cache = read_cache.TTLCache(app.config['USER_SEARCH_CACHE_SIZE'], app.config['USER_SEARCH_CACHE_TTL'])
 
 @app.route('/mini-it-static/<path:filename>')
 def serve_mini_it_static(filename):
     return send_from_directory('/home/budgetbadgersite/Mini-IT-TC4L-Group-7/static', filename)
 
 
-def get_db_connection():
-    # Establish a connection to the SQLite database
-    conn = sqlite3.connect('budgetbadger.db', timeout=30)
-    conn.row_factory = sqlite3.Row  # Set row factory to return rows as dictionaries
-    return conn
+# Database paths already brought up to the current schema by this process
+initialized_databases = set()
+initialize_lock = threading.Lock()
 
-def fetch_incomes_from_db(username):
-    # Fetch all income records for a specific user
-    conn = get_db_connection()
-    incomes = conn.execute('SELECT * FROM income WHERE username = ?', (username,)).fetchall()
-    conn.close()  # Close the database connection
-    return incomes
+def ensure_database(path):
+    # Create and migrate the database at path the first time this process opens it, so the
+    # schema follows app.config['DATABASE'] even when it is changed after import.
+    if path in initialized_databases:
+        return
+    with initialize_lock:
+        if path not in initialized_databases:
+            database.init_db(path)
+            initialized_databases.add(path)
 
-def fetch_expenses_from_db(username):
-    # Fetch all expense records for a specific user
-    conn = get_db_connection()
-    expenses = conn.execute('SELECT * FROM expenses WHERE username = ?', (username,)).fetchall()
-    conn.close()  # Close the database connection
-    return expenses
+def get_db_connection():
+    # Reuse one SQLite connection for the whole request (or app context); it is closed
+    # by close_db_connection when the context ends, so helpers must not close it themselves.
+    if 'db' not in g:
+        ensure_database(app.config['DATABASE'])
+        g.db = database.connect(app.config['DATABASE'], factory=instrumentation.ProfiledConnection)
+        g.db.row_factory = sqlite3.Row  # Set row factory to return rows as dictionaries
+        g.db.profile = instrumentation.current_profile()  # Record this request's statements, if profiling
+    return g.db
+
+instrumentation.init_app(app, get_db_connection)
+
+@app.teardown_appcontext
+def close_db_connection(exception):
+    # Close the request's connection, discarding anything left uncommitted
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
 
 def fetch_recent_incomes_from_db(username, limit=4):
     conn = get_db_connection()
     query = 'SELECT * FROM income WHERE username = ? ORDER BY date DESC LIMIT ?'
     incomes = conn.execute(query, (username, limit)).fetchall()
-    conn.close()
     return incomes
 
 def fetch_recent_expenses_from_db(username, limit=4):
     conn = get_db_connection()
     query = 'SELECT * FROM expenses WHERE username = ? ORDER BY date DESC LIMIT ?'
     expenses = conn.execute(query, (username, limit)).fetchall()
-    conn.close()
-    return expenses
-
-def fetch_current_month_expenses(username):
-    # Get the current year and month
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-
-    # SQL query to fetch only expenses for the current month and year
-    query = """
-        SELECT * FROM expenses
-        WHERE username = ? AND strftime('%Y', date) = ? AND strftime('%m', date) = ?
-    """
-    year_str = str(current_year)
-    month_str = f'{current_month:02d}'  # Ensure it's two digits (e.g., '09' for September)
-
-    # Execute the query and return the result
-    conn = get_db_connection()  # Use get_db_connection() to get the database connection
-    expenses = conn.execute(query, (username, year_str, month_str)).fetchall()
-    conn.close()  # Remember to close the connection
     return expenses
 
-def fetch_current_month_incomes(username):
-    # Get the current year and month
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-
-    # SQL query to fetch only incomes for the current month and year
-    query = """
-        SELECT * FROM income
-        WHERE username = ? AND strftime('%Y', date) = ? AND strftime('%m', date) = ?
-    """
-    year_str = str(current_year)
-    month_str = f'{current_month:02d}'  # Ensure it's two digits (e.g., '09' for September)
-
-    # Execute the query and return the result
-    conn = get_db_connection()  # Use get_db_connection() to get the database connection
-    incomes = conn.execute(query, (username, year_str, month_str)).fetchall()
-    conn.close()  # Remember to close the connection
-    return incomes
-
-def fetch_current_year_expenses(username):
-    # Get the current year
-    current_year = datetime.now().year
-
-    # SQL query to fetch only expenses for the current year
-    query = """
-        SELECT * FROM expenses
-        WHERE username = ? AND strftime('%Y', date) = ?
-    """
-    year_str = str(current_year)
-
-    # Execute the query and return the result
+def transaction_conditions(username, start=None, end=None, category=None, min_amount=None, max_amount=None):
+    # WHERE conditions and parameters selecting one user's rows with start <= date < end and the
+    # optional category and inclusive amount bounds; shared by the page and export queries.
+    conditions = ['username = ?']
+    params = [username]
+    if start is not None:
+        conditions.append('date >= ?')
+        params.append(start.isoformat())
+    if end is not None:
+        conditions.append('date < ?')
+        params.append(end.isoformat())
+    if category:
+        conditions.append('category = ?')
+        params.append(category)
+    if min_amount is not None:
+        conditions.append('amount >= ?')
+        params.append(min_amount)
+    if max_amount is not None:
+        conditions.append('amount <= ?')
+        params.append(max_amount)
+    return conditions, params
+
+def fetch_transaction_page(username, tables=('income', 'expenses'), cursor=None, limit=50,
+                           start=None, end=None, category=None, min_amount=None, max_amount=None):
+    # One page of a user's transactions, newest first, with income and expenses interleaved.
+    # Rows are ordered by (date, kind, id) descending and `cursor` is the (date, kind, id) of the last
+    # row already shown, so each page is an index range scan whose cost does not grow with history.
+    # Returns (rows, next_cursor); next_cursor is None on the last page.
+    conditions, params = transaction_conditions(username, start, end, category, min_amount, max_amount)
+
+    branches = []
+    branch_params = []
+    for table in tables:
+        kind = TRANSACTION_TABLES[table]
+        table_conditions = list(conditions)
+        table_params = list(params)
+        if cursor is not None:
+            # date <= ? keeps the scan on the (username, date) index; the row value does the exact cut
+            table_conditions.append(f"date <= ? AND (date, '{kind}', id) < (?, ?, ?)")
+            table_params.extend([cursor[0], *cursor])
+        branches.append(f'''
+            SELECT * FROM (
+                SELECT '{kind}' AS kind, id, date, amount, category, description
+                FROM {kind}
+                WHERE {' AND '.join(table_conditions)}
+                ORDER BY date DESC, id DESC
+                LIMIT ?
+            )''')
+        branch_params.extend(table_params + [limit + 1])
+
+    query = ' UNION ALL '.join(branches) + ' ORDER BY date DESC, kind DESC, id DESC LIMIT ?'
     conn = get_db_connection()
-    expenses = conn.execute(query, (username, year_str)).fetchall()
-    conn.close()
-    return expenses
+    rows = conn.execute(query, branch_params + [limit + 1]).fetchall()
+
+    # The extra row only tells us whether another page exists
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last['date'], last['kind'], last['id'])
+    return rows, None
+
+def iter_transactions(username, tables=('income', 'expenses'), start=None, end=None,
+                      category=None, min_amount=None, max_amount=None):
+    # Yield a user's transactions oldest first as (date, kind, id, amount, category, description)
+    # tuples, straight from the cursors. Each table is read in (username, date) index order and the
+    # streams are merged lazily, so memory use stays flat however long the history is.
+    conditions, params = transaction_conditions(username, start, end, category, min_amount, max_amount)
 
-def fetch_current_year_incomes(username):
-    # Get the current year
-    current_year = datetime.now().year
-
-    # SQL query to fetch only incomes for the current year
-    query = """
-        SELECT * FROM income
-        WHERE username = ? AND strftime('%Y', date) = ?
-    """
-    year_str = str(current_year)
-
-    # Execute the query and return the result
     conn = get_db_connection()
-    incomes = conn.execute(query, (username, year_str)).fetchall()
-    conn.close()
-    return incomes
-
-def fetch_entries(username):
-    # Establish a database connection
+    cursors = []
+    for table in tables:
+        kind = TRANSACTION_TABLES[table]
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Plain tuples; heapq.merge compares them directly
+        cursor.execute(f'''SELECT date, '{kind}', id, amount, category, description
+                           FROM {kind}
+                           WHERE {' AND '.join(conditions)}
+                           ORDER BY date, id''', params)
+        cursors.append(cursor)
+
+    yield from heapq.merge(*cursors)
+
+# Date windows are half-open [start, end) pairs of datetime.date, so consecutive windows never overlap.
+def month_window(day=None):
+    # Window covering the calendar month containing `day` (defaults to today)
+    day = day or date.today()
+    start = day.replace(day=1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+def quarter_window(day=None):
+    # Window covering the calendar quarter containing `day`
+    day = day or date.today()
+    first_month = 3 * ((day.month - 1) // 3) + 1
+    start = date(day.year, first_month, 1)
+    end = date(day.year + 1, 1, 1) if first_month == 10 else date(day.year, first_month + 3, 1)
+    return start, end
+
+def year_window(day=None):
+    # Window covering the calendar year containing `day`
+    day = day or date.today()
+    return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+
+def rolling_window(days, day=None):
+    # Window covering the last `days` days, up to and including `day`
+    end = (day or date.today()) + timedelta(days=1)
+    return end - timedelta(days=days), end
+
+# Whitelist of transaction tables, since table names cannot be bound as query parameters.
+TRANSACTION_TABLES = {'income': 'income', 'expenses': 'expenses'}
+
+def fetch_transactions_in_window(table, username, start, end):
+    # Fetch one user's rows from `table` with start <= date < end, for any window (e.g. a rolling
+    # 30 days). Dates are stored as 'YYYY-MM-DD' text, so plain comparisons sort correctly and can
+    # use the (username, date) index.
+    query = f'SELECT * FROM {TRANSACTION_TABLES[table]} WHERE username = ? AND date >= ? AND date < ?'
     conn = get_db_connection()
+    rows = conn.execute(query, (username, start.isoformat(), end.isoformat())).fetchall()
+    return rows
 
-    # SQL query to fetch all dates from income and expenses for the user
+# The rollup readers below work in whole months: start and end must be the first day of a month,
+# as the month/quarter/year windows are; use fetch_transactions_in_window for other windows. Each reads a few monthly_rollups rows, not raw history.
+def fetch_category_totals(table, username, start, end):
+    # Per-category totals of one user's `table` rows within [start, end)
     query = '''
-        SELECT date FROM income WHERE username = ?
-        UNION ALL
-        SELECT date FROM expenses WHERE username = ?
+        SELECT category, SUM(total) AS amount
+        FROM monthly_rollups
+        WHERE username = ? AND kind = ? AND month >= ? AND month < ?
+        GROUP BY category
+        ORDER BY amount DESC
     '''
-    # Execute the query and fetch all results
-    entries = conn.execute(query, (username, username)).fetchall()
-
-    conn.close()  # Close the database connection
-    # Return a list of dates from the entries
-    return [entry['date'] for entry in entries]
-
-def fetch_monthly_entries(username):
-    # Establish a database connection
     conn = get_db_connection()
+    return conn.execute(query, (username, TRANSACTION_TABLES[table], f'{start:%Y-%m}', f'{end:%Y-%m}')).fetchall()
 
-    # SQL query to count income entries grouped by month
-    income_entries_query = '''
-        SELECT strftime('%Y-%m', date) AS month, COUNT(*) AS count
-        FROM income
-        WHERE username = ?
-        GROUP BY month
-    '''
-    income_entries = conn.execute(income_entries_query, (username,)).fetchall()
-
-    # SQL query to count expense entries grouped by month
-    expense_entries_query = '''
-        SELECT strftime('%Y-%m', date) AS month, COUNT(*) AS count
-        FROM expenses
-        WHERE username = ?
+def fetch_monthly_totals(table, username, start, end):
+    # Per-month totals of one user's `table` rows within [start, end), as (month 'YYYY-MM', amount) rows
+    query = '''
+        SELECT month, SUM(total) AS amount
+        FROM monthly_rollups
+        WHERE username = ? AND kind = ? AND month >= ? AND month < ?
         GROUP BY month
+        ORDER BY month
     '''
-    expense_entries = conn.execute(expense_entries_query, (username,)).fetchall()
-
-    conn.close()  # Close the database connection
-
-    # Create dictionaries for monthly income and expense counts
-    monthly_income_entries = {entry['month']: entry['count'] for entry in income_entries}
-    monthly_expense_entries = {entry['month']: entry['count'] for entry in expense_entries}
-
-    # Return the total counts of income and expenses
-    return {
-        'income': sum(monthly_income_entries.values()),
-        'expense': sum(monthly_expense_entries.values())
-    }
-
-def calculate_income_points(username):
-    # Fetch incomes for the specified user
-    incomes = fetch_incomes_from_db(username)
-    income_points = 0
-
-    # Calculate points based on income categories
-    for income in incomes:
-        amount = income['amount']
-        category = income['category']
-
-        # Assign points based on the category of income
-        if category == 'Salary':
-            income_points += (amount // 100) * 10
-        elif category == 'Business':
-            income_points += (amount // 100) * 15
-        elif category == 'Gifts':
-            income_points += (amount // 100) * 5
-        elif category == 'Extra Income':
-            income_points += (amount // 100) * 7
-        elif category == 'Loan':
-            income_points += (amount // 100) * 3
-        elif category == 'Insurance Payout':
-            income_points += (amount // 100) * 8
-        elif category == 'Other Incomes':
-            income_points += (amount // 100) * 6
-
-    return income_points  # Return the total income points
-
-def calculate_expense_points(username):
-    # Fetch expenses for the specified user
-    expenses = fetch_expenses_from_db(username)
-    essential_expenses_categories = {'Groceries', 'Healthcare', 'Education', 'Food & Drinks', 'Transport'}
-    expense_points = 0
-    non_essential_points = 0
-    total_non_essential_spending = 0
-
-    # Calculate points based on expense categories
-    for expense in expenses:
-        amount = expense['amount']
-        category = expense['category']
-
-        if category in essential_expenses_categories:
-            expense_points += (amount // 100) * 5  # Points for essential expenses
-        else:
-            non_essential_points += (amount // 100) * 2  # Points for non-essential expenses
-            total_non_essential_spending += amount
-
-    # Apply penalty for excessive non-essential spending over $1000
-    if total_non_essential_spending > 1000:
-        excess_amount = total_non_essential_spending - 1000
-        penalty_points = (excess_amount // 100) * 5
-        non_essential_points -= penalty_points
-
-    return expense_points + non_essential_points  # Return total expense points
-
-def calculate_balanced_activity_bonus(username):
-    # Fetch incomes and expenses for the specified user
-    incomes = fetch_incomes_from_db(username)
-    expenses = fetch_expenses_from_db(username)
-
-    # Calculate total income and expenses
-    total_income = sum(income['amount'] for income in incomes)
-    total_expense = sum(expense['amount'] for expense in expenses)
-
-    balance_bonus = 0
-
-    # Return 0 if there are no expenses
-    if total_expense == 0:
-        return balance_bonus
-
-    # Calculate income-to-expense ratio and determine balance bonus
-    income_expense_ratio = total_income / total_expense
-    if income_expense_ratio > 1:
-        percentage_extra_income = (income_expense_ratio - 1) * 100
-        balance_bonus = (percentage_extra_income // 10) * 20
-
-    # Fetch monthly entries for consistency bonus
-    monthly_entries = fetch_monthly_entries(username)
-    income_entries = monthly_entries['income']
-    expense_entries = monthly_entries['expense']
-
-    # Consistency bonus based on the number of entries
-    consistency_bonus = 30 if income_entries >= 5 and expense_entries >= 5 else 0
-
-    return balance_bonus + consistency_bonus  # Return total bonus points
-
-def has_seven_day_streak(dates):
-    date_format = "%Y-%m-%d"
-    dates = [datetime.strptime(date, date_format) for date in dates]  # Convert date strings to datetime objects
-    dates = sorted(set(dates))  # Remove duplicates and sort the dates
-
-    # Check if there are at least 7 unique dates
-    if len(dates) < 7:
-        return False
-
-    # Check for a 7-day streak
-    for i in range(len(dates) - 6):
-        streak_dates = dates[i:i+7]
-        if streak_dates[-1] - streak_dates[0] == timedelta(days=6):
-            return True  # Return True if a streak is found
-
-    return False  # Return False if no streak is found
-
-def calculate_daily_streak(username):
-    # Fetch entries for the specified user
-    entries = fetch_entries(username)
-    daily_streak_points = 0
-
-    # Check for a 7-day streak and award points if found
-    if has_seven_day_streak(entries):
-        daily_streak_points += 10
-
-    return daily_streak_points  # Return daily streak points
+    conn = get_db_connection()
+    return conn.execute(query, (username, TRANSACTION_TABLES[table], f'{start:%Y-%m}', f'{end:%Y-%m}')).fetchall()
 
-def generate_pie_chart(data, title, labels, filename, username):
+@instrumentation.timed('chart')
+def generate_pie_chart(data, title, labels, filename, username, period=None):
     # Create a directory for the user if it doesn't exist
-    user_folder = f'/home/budgetbadgersite/Mini-IT-TC4L-Group-7/static/images/{username}'
+    user_folder = os.path.join(app.config['CHART_FOLDER'], username)
     os.makedirs(user_folder, exist_ok=True)
 
-    # Prepare data for pie chart
+    # Skip rendering if this chart was already drawn from the same rows
+    preset, output_format = app.config['CHART_PRESET'], app.config['CHART_FORMAT']
+    file_path = os.path.join(user_folder, f'{filename}.{output_format}')
+    key = chart_cache.cache_key(username, f'{filename}:{preset}', period, chart_cache.fingerprint(data, ('amount', 'category')))
+    if chart_cache.is_fresh(file_path, key):
+        return file_path
+
+    # Prepare data for pie chart and hand it to the render workers
     amounts = [item['amount'] for item in data]
     categories = [item['category'] for item in data]
+    render_chart(key, file_path, charts.render_pie_chart, amounts, categories, title, preset)
+    return file_path
 
-    # Create a pie chart
-    plt.figure(figsize=(8, 6))
-    label_font = {'fontsize': 17, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': '#c0e2df'}
-
-    plt.pie(
-        amounts,
-        labels=categories,
-        autopct=lambda p: f'{p:.1f}%',
-        startangle=140,
-        textprops=label_font,
-        pctdistance=0.85  # Adjusts the position of the percentage text
-    )
-
-    # Set font properties for percentage labels
-    for text in plt.gca().texts:
-        text.set_fontsize(15)  # Set the font size for all percentage labels
-        text.set_fontfamily('serif')
-        text.set_fontweight('normal')
-        text.set_color('#c0e2df')
-
-    plt.title(title, fontsize=25, fontfamily='serif', fontweight='bold', color='#c0e2df')
-
-    # Save the pie chart as an image
-    file_path = os.path.join(user_folder, f'{filename}.png')
-    plt.savefig(file_path, dpi=300, transparent=True)
-    plt.close()
-
-def generate_frequency_polygon(data, title, filename, username):
+@instrumentation.timed('chart')
+def generate_frequency_polygon(months, amounts, title, filename, username, period=None):
+    # months and amounts are a series from series.monthly_series
     # Create a directory for the user if it doesn't exist
-    user_folder = f'/home/budgetbadgersite/Mini-IT-TC4L-Group-7/static/images/{username}'
+    user_folder = os.path.join(app.config['CHART_FOLDER'], username)
     os.makedirs(user_folder, exist_ok=True)
 
- # Convert data into a DataFrame for processing
-    df = pd.DataFrame(data, columns=['date', 'amount'])
-
-    # Validate DataFrame structure
-    if 'date' not in df.columns or 'amount' not in df.columns:
-        raise ValueError("Data must contain 'date' and 'amount' columns")
-
-    # Convert date strings to datetime objects
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Set date as index and resample to monthly totals
-    df.set_index('date', inplace=True)
-    monthly_totals = df.resample('M').sum().reset_index()
-
-    # Prepare a complete range of months for the year
-    all_months = pd.date_range(start='2024-01-01', end='2024-12-31', freq='M')
-    all_months_df = pd.DataFrame({'date': all_months})
-    all_months_df['month'] = all_months_df['date'].dt.strftime('%b')
-    all_months_df['amount'] = 0
-
-    # Merge monthly totals with all months for plotting
-    monthly_totals['month'] = monthly_totals['date'].dt.strftime('%b')
-    merged_df = pd.merge(all_months_df, monthly_totals, on='month', suffixes=('_all', '_actual'), how='left')
-    merged_df['amount'] = merged_df['amount_actual'].fillna(0)
-
-    # Create a frequency polygon
-    plt.figure(figsize=(21, 14))
-    plt.plot(merged_df['month'], merged_df['amount'], marker='o', linestyle='-', color='#39FF14')
-    plt.title(title, fontsize=50, fontfamily='serif', fontweight='bold', color='#c0e2df')
-    plt.xlabel('Month', fontsize=40, fontfamily='serif', fontweight='bold', color='#c0e2df')
-    plt.ylabel('Amount', fontsize=40, fontfamily='serif', fontweight='bold', color='#c0e2df')
-
-    plt.xticks(ticks=range(12), labels=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], rotation=45)
-
-    # Customize ticks and spine colors
-    plt.tick_params(axis='x', labelsize=30, colors='#c0e2df')
-    plt.tick_params(axis='y', labelsize=30, colors='#c0e2df')
-
-    ax = plt.gca()
-    ax.spines['bottom'].set_color('#c0e2df')
-    ax.spines['top'].set_color('#c0e2df')
-    ax.spines['right'].set_color('#c0e2df')
-    ax.spines['left'].set_color('#c0e2df')
-
-    # Add grid and adjust layout
-    plt.grid(color='gray', linestyle='--', linewidth=0.7)
-    plt.tight_layout()  # Adjust layout to prevent clipping of tick-labels
-
-    # Save the plot
-    file_path = os.path.join(user_folder, f'{filename}_{username}.png')
-    plt.savefig(file_path, dpi=300, transparent=True)
-    plt.close()
+    # Skip rendering if this chart was already drawn from the same rows
+    preset, output_format = app.config['CHART_PRESET'], app.config['CHART_FORMAT']
+    file_path = os.path.join(user_folder, f'{filename}_{username}.{output_format}')
+    key = chart_cache.cache_key(username, f'{filename}:{preset}', period,
+                                chart_cache.fingerprint(zip(months, amounts), (0, 1)))
+    if chart_cache.is_fresh(file_path, key):
+        return file_path
 
+    # Hand the series to the render workers
+    render_chart(key, file_path, charts.render_frequency_polygon, months, amounts, title, preset)
     return file_path
 
+def render_chart(key, file_path, render, *args):
+    # Queue a chart render off-request; the page keeps showing the previous image until it lands.
+    # A cache miss counts as a view, so the user's folder is touched before anything is evicted.
+    user_folder = os.path.dirname(file_path)
+    chart_cache.touch(user_folder)
+    render_service.configure(app.config['CHART_RENDER_WORKERS'])
+    render_service.submit(key, file_path, render, *args)
+
+    # Drop charts of users who have not viewed them in a while, never the one being rendered for
+    chart_cache.evict_stale(app.config['CHART_FOLDER'], app.config['MAX_CACHED_CHART_USERS'], keep=user_folder)
+
+def chart_url(file_path):
+    # URL of a rendered chart, or a placeholder while its first render is still running.
+    # The modification time is appended so browsers pick up re-rendered images.
+    if not os.path.exists(file_path):
+        return url_for('serve_mini_it_static', filename='budgetbadgernobg.png')
+    relative_path = os.path.relpath(file_path, app.config['CHART_FOLDER']).replace(os.sep, '/')
+    return url_for('static', filename=f'images/{relative_path}', v=int(os.path.getmtime(file_path)))
+
+def charts_pending(*file_paths):
+    # True while any of the given charts is still being rendered
+    return any(render_service.is_pending(file_path) for file_path in file_paths)
+
+def invalidate_charts(username):
+    # Called after a user's transactions change so their charts are redrawn on next view
+    chart_cache.invalidate(os.path.join(app.config['CHART_FOLDER'], username))
+
 def determine_ap_badge_id(ap):
     # Determine badge ID based on achievement points
-    if ap is None or ap <= 0:
-        return 1
-    if ap >= 50000:
-        return 7
-    if ap >= 25000:
-        return 6
-    if ap >= 10000:
-        return 5
-    if ap >= 5000:
-        return 4
-    if ap >= 2500:
-        return 3
-    return 2
+    return scoring.badge_id(ap, scoring.AP_BADGE_THRESHOLDS)
 
 def determine_income_badge_id(income):
     # Determine badge ID based on total income
-    if income is None or income <= 0:
-        return 1
-    if income >= 20000:
-        return 7
-    if income >= 10000:
-        return 6
-    if income >= 5000:
-        return 5
-    if income >= 2000:
-        return 4
-    if income >= 100:
-        return 3
-    return 2
+    return scoring.badge_id(income, scoring.INCOME_BADGE_THRESHOLDS)
 
 def determine_expense_badge_id(expense):
     # Determine badge ID based on total expenses
-    if expense is None or expense <= 0:
-        return 1
-    if expense >= 20000:
-        return 7
-    if expense >= 10000:
-        return 6
-    if expense >= 5000:
-        return 5
-    if expense >= 2000:
-        return 4
-    if expense >= 1000:
-        return 3
-    return 2
+    return scoring.badge_id(expense, scoring.EXPENSE_BADGE_THRESHOLDS)
 
+@instrumentation.timed('badges')
 def assign_badges(username):
     # Connect to the database and retrieve user data for badge assignment
     conn = get_db_connection()
@@ -466,7 +353,6 @@ def assign_badges(username):
 
     # Commit the changes and close the connection
     conn.commit()
-    conn.close()
 
 def update_follower_following_counts(username):
     # Establishes a database connection and updates the follower and following counts for the given username.
@@ -484,80 +370,201 @@ def update_follower_following_counts(username):
     cur.execute('UPDATE users SET following_count = ? WHERE username = ?', (following_count, username))
 
     conn.commit()
-    conn.close()
+
+def leaderboard_version():
+    # Shared version of the cached leaderboards. Every committed leaderboard or follow change moves
+    # it on, including scores written by the job worker, so all web processes drop stale reads.
+    return database.cache_version(get_db_connection(), 'leaderboard')
 
 def fetch_global_leaderboard():
     # Retrieves the top 10 users based on achievement points from the leaderboard.
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''SELECT username, achievement_points FROM leaderboard ORDER BY achievement_points DESC LIMIT 10''')
-    top_users = cursor.fetchall()
-    conn.close()
-    return top_users
+    # The list is the same for every viewer, so it is served from leaderboard_cache.
+    def load():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''SELECT username, achievement_points FROM leaderboard ORDER BY achievement_points DESC, id DESC LIMIT 10''')
+        return cursor.fetchall()
+
+    return leaderboard_cache.get_or_load('global', load, leaderboard_version())
 
 def fetch_followed_leaderboard(current_user):
     # Fetches the leaderboard for users that the current_user is following, limited to the top 10 by achievement points.
+    # Cached per follower; the least recently viewed followers' entries are evicted first.
+    def load():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''SELECT l.username, l.achievement_points
+                          FROM leaderboard l
+                          JOIN follow_relationships f ON l.username = f.following
+                          WHERE f.follower = ?
+                          ORDER BY l.achievement_points DESC, l.id DESC
+                          LIMIT 10''', (current_user,))
+        return cursor.fetchall()
+
+    return leaderboard_cache.get_or_load(('followed', current_user), load, leaderboard_version())
+
+# Ranked leaderboard pages. Rows are ordered by (achievement_points, id) descending, which is the
+# order of idx_leaderboard_achievement_points read backwards (an index entry ends with the rowid),
+# so pages are keyset range scans and never sort the table. Ranks are competition ranks (RANK():
+# tied users share a rank): 1 + the number of users with strictly more points.
+
+def fetch_leaderboard_page(cursor=None, limit=50):
+    # One page of the global leaderboard after cursor, the (achievement_points, id) of the last row
+    # already shown. Returns (rows of rank, username, achievement_points, next_cursor or None).
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''SELECT l.username, l.achievement_points
-                      FROM leaderboard l
-                      JOIN follow_relationships f ON l.username = f.following
-                      WHERE f.follower = ?
-                      ORDER BY l.achievement_points DESC
-                      LIMIT 10''', (current_user,))
-    followed_users = cursor.fetchall()
-    conn.close()
-    return followed_users
-
-def update_leaderboard():
-    # Updates the leaderboard for all users by calculating and storing their total achievement points, income, and expenses.
+    conditions, params = '', []
+    if cursor is not None:
+        # points <= ? keeps the scan on the index; the row value does the exact cut
+        conditions = 'WHERE achievement_points <= ? AND (achievement_points, id) < (?, ?)'
+        params = [cursor[0], *cursor]
+    rows = conn.execute(f'''SELECT id, username, achievement_points,
+                                   RANK() OVER (ORDER BY achievement_points DESC) AS page_rank
+                            FROM (SELECT id, username, achievement_points FROM leaderboard
+                                  {conditions}
+                                  ORDER BY achievement_points DESC, id DESC
+                                  LIMIT ?)
+                            ORDER BY achievement_points DESC, id DESC''', params + [limit + 1]).fetchall()
+    if not rows:
+        return [], None
+
+    # The window rank only counts rows on this page. Add the users above the page: everyone with more
+    # points than its first row (an indexed count), plus, for rows below the leading tie group, the
+    # members of that group shown on earlier pages.
+    top_points = rows[0]['achievement_points']
+    above = tied_before = 0
+    if cursor is not None:
+        above = conn.execute('SELECT COUNT(*) FROM leaderboard WHERE achievement_points > ?', (top_points,)).fetchone()[0]
+        tied_before = conn.execute('SELECT COUNT(*) FROM leaderboard WHERE achievement_points = ? AND id > ?',
+                                   (top_points, rows[0]['id'])).fetchone()[0]
+
+    page = [{'rank': above + row['page_rank'] + (tied_before if row['achievement_points'] < top_points else 0),
+             'username': row['username'],
+             'achievement_points': row['achievement_points']} for row in rows[:limit]]
+    next_cursor = (rows[limit - 1]['achievement_points'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return page, next_cursor
+
+def fetch_followed_leaderboard_page(follower, cursor=None, limit=50):
+    # Like fetch_leaderboard_page, but ranked among the users follower follows. That set is only as
+    # large as their follow list, so it is ranked whole with RANK() and then cut at the cursor.
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Fetches all usernames from the users table.
-    users = conn.execute('SELECT username FROM users').fetchall()
-
-    for user in users:
-        username = user['username']
-
-        # Calculates total achievement points based on different criteria.
-        total_ap = calculate_income_points(username) + \
-                   calculate_expense_points(username) + \
-                   calculate_balanced_activity_bonus(username) + \
-                   calculate_daily_streak(username)
-
-        # Sums up total income and total expenses for the user.
-        total_income = conn.execute('SELECT SUM(amount) FROM income WHERE username = ?', (username,)).fetchone()[0] or 0
-        total_expense = conn.execute('SELECT SUM(amount) FROM expenses WHERE username = ?', (username,)).fetchone()[0] or 0
-
-        # Updates or inserts the user's achievement points, total income, and total expenses in the leaderboard.
-        cursor.execute('''INSERT INTO leaderboard (username, achievement_points, total_income, total_expense)
-                          VALUES (?, ?, ?, ?)
-                          ON CONFLICT(username)
-                          DO UPDATE SET
-                              achievement_points = excluded.achievement_points,
-                              total_income = excluded.total_income,
-                              total_expense = excluded.total_expense''', (username, total_ap, total_income, total_expense))
+    conditions, params = '', [follower]
+    if cursor is not None:
+        conditions = 'WHERE (achievement_points, id) < (?, ?)'
+        params += list(cursor)
+    rows = conn.execute(f'''SELECT * FROM (
+                                SELECT l.id, l.username, l.achievement_points,
+                                       RANK() OVER (ORDER BY l.achievement_points DESC) AS rank
+                                FROM follow_relationships f
+                                JOIN leaderboard l ON l.username = f.following
+                                WHERE f.follower = ?
+                            )
+                            {conditions}
+                            ORDER BY achievement_points DESC, id DESC
+                            LIMIT ?''', params + [limit + 1]).fetchall()
+
+    page = [{'rank': row['rank'], 'username': row['username'], 'achievement_points': row['achievement_points']}
+            for row in rows[:limit]]
+    next_cursor = (rows[limit - 1]['achievement_points'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return page, next_cursor
+
+def fetch_rank(username):
+    # (rank, achievement_points) of one user on the global leaderboard, or None if they have no row.
+    # Counting the users above is a range scan over the index entries above them, not a sort.
+    conn = get_db_connection()
+    row = conn.execute('SELECT achievement_points FROM leaderboard WHERE username = ?', (username,)).fetchone()
+    if row is None:
+        return None
+    above = conn.execute('SELECT COUNT(*) FROM leaderboard WHERE achievement_points > ?',
+                         (row['achievement_points'],)).fetchone()[0]
+    return above + 1, row['achievement_points']
+
+def fetch_followed_rank(follower, username):
+    # (rank, achievement_points) of username among the users follower follows plus username itself.
+    conn = get_db_connection()
+    row = conn.execute('SELECT achievement_points FROM leaderboard WHERE username = ?', (username,)).fetchone()
+    if row is None:
+        return None
+    above = conn.execute('''SELECT COUNT(*) FROM follow_relationships f
+                            JOIN leaderboard l ON l.username = f.following
+                            WHERE f.follower = ? AND f.following != ? AND l.achievement_points > ?''',
+                         (follower, username, row['achievement_points'])).fetchone()[0]
+    return above + 1, row['achievement_points']
+
+def search_usernames(query, limit=10):
+    # Usernames starting with query (case-insensitively), then, if the optional trigram index exists
+    # and there is room left, usernames containing it. The prefix part is a range scan on
+    # idx_users_username_nocase; U+10FFFF sorts after any character a matching username continues with.
+    def load():
+        conn = get_db_connection()
+        rows = conn.execute('''SELECT username FROM users
+                               WHERE username COLLATE NOCASE >= ? AND username COLLATE NOCASE < ?
+                               ORDER BY username COLLATE NOCASE
+                               LIMIT ?''', (query, query + '\U0010ffff', limit)).fetchall()
+        usernames = [row['username'] for row in rows]
+
+        # Trigram matching needs at least three characters
+        if len(usernames) < limit and len(query) >= 3 and database.has_user_search_index(conn):
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = conn.execute('''SELECT username FROM users_search
+                                   WHERE users_search MATCH ?
+                                   ORDER BY rank
+                                   LIMIT ?''', (phrase, limit + len(usernames))).fetchall()
+            seen = set(usernames)
+            usernames += [row['username'] for row in rows if row['username'] not in seen][:limit - len(usernames)]
+
+        return usernames
+
+    return user_search_cache.get_or_load((query.lower(), limit), load)
+
+@instrumentation.timed('scoring')
+def rebuild_leaderboard():
+    # Full offline rebuild: recomputes every user's streak state, then rescores everyone in one
+    # vectorised pass and rewrites their leaderboard and badge rows in bulk.
+    conn = get_db_connection()
+    database.rebuild_streaks(conn)
+    return scoring.rebuild_all_scores(conn)
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    # Admin command (`flask --app app rebuild-rollups`) to recompute monthly_rollups from the raw transactions.
+    database.rebuild_rollups(get_db_connection())
+    print('Monthly rollups rebuilt.')
+
+@app.cli.command('repair-follow-counts')
+@click.argument('username', required=False)
+def repair_follow_counts_command(username):
+    # Admin command (`flask --app app repair-follow-counts [USERNAME]`) to resync the follower/following
+    # counters with follow_relationships, for one user or for everyone.
+    if username:
+        update_follower_following_counts(username)
+        print(f'Follow counts recomputed for {username}.')
+    else:
+        repaired = database.repair_follow_counts(get_db_connection())
+        print(f'Follow counts repaired for {repaired} users.')
+
+@app.cli.command('build-search-index')
+def build_search_index_command():
+    # Admin command (`flask --app app build-search-index`) to enable substring matches in user search.
+    if database.create_user_search_index(get_db_connection()):
+        user_search_cache.bump()
+        print('User search index built.')
+    else:
+        print('This SQLite build has no FTS5 trigram tokenizer; search stays prefix-only.')
 
-    conn.commit()
-    conn.close()
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    # Admin command (`flask --app app rebuild-leaderboard`) for backfills and scoring rule changes.
+    rebuilt = rebuild_leaderboard()
+    print(f'Leaderboard rebuilt for {rebuilt} users.')
 
+@instrumentation.timed('scoring')
 def update_leaderboard_for_user(username):
     # Updates the leaderboard for a specific user by recalculating their total achievement points, income, and expenses.
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Calculates total achievement points for the specific user.
-    total_ap = (
-        calculate_income_points(username) +
-        calculate_expense_points(username) +
-        calculate_balanced_activity_bonus(username) +
-        calculate_daily_streak(username)
-    )
-
-    # Sums up total income and total expenses for the user.
-    total_income = conn.execute('SELECT SUM(amount) FROM income WHERE username = ?', (username,)).fetchone()[0] or 0
-    total_expense = conn.execute('SELECT SUM(amount) FROM expenses WHERE username = ?', (username,)).fetchone()[0] or 0
+    # Calculates total achievement points, income and expenses from the grouped aggregates.
+    total_ap, total_income, total_expense = scoring.score_user(conn, username)
 
     # Updates or inserts the user's achievement points, total income, and total expenses in the leaderboard.
     cursor.execute('''INSERT INTO leaderboard (username, achievement_points, total_income, total_expense)
@@ -566,10 +573,56 @@ def update_leaderboard_for_user(username):
                       DO UPDATE SET
                           achievement_points = excluded.achievement_points,
                           total_income = excluded.total_income,
-                          total_expense = excluded.total_expense''', (username, total_ap, total_income, total_expense))
+                          total_expense = excluded.total_expense
+                      WHERE achievement_points IS NOT excluded.achievement_points
+                         OR total_income IS NOT excluded.total_income
+                         OR total_expense IS NOT excluded.total_expense''', (username, total_ap, total_income, total_expense))
+
+    # Only a row that actually changed makes the cached leaderboards stale
+    if cursor.rowcount:
+        database.bump_cache_version(conn, 'leaderboard')
 
     conn.commit()
-    conn.close()
+
+def refresh_scores(username):
+    # Job handler: rescore the user, then refresh their badges from the new totals.
+    update_leaderboard_for_user(username)
+    assign_badges(username)
+
+# Background job handlers by kind (see jobs.py); each takes the username the job is for.
+JOB_HANDLERS = {
+    'scores': refresh_scores,
+    'charts': invalidate_charts,
+}
+
+def enqueue_refresh(conn, username):
+    # Queue the follow-up work for a change to the user's transactions. Call it inside the
+    # transaction making the change; duplicate jobs for the user coalesce in the queue.
+    jobs.enqueue(conn, 'scores', username)
+    jobs.enqueue(conn, 'charts', username)
+
+def run_inline_jobs():
+    # With JOBS_INLINE set (development, no worker running), drain the queue within the request.
+    if app.config['JOBS_INLINE']:
+        conn = get_db_connection()
+        while jobs.run_next(conn, JOB_HANDLERS):
+            pass
+
+@app.cli.command('run-jobs')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty instead of waiting for more jobs.')
+@click.option('--poll', default=1.0, help='Seconds to sleep between checks while the queue is empty.')
+def run_jobs_command(once, poll):
+    # Worker (`flask --app app run-jobs`) for the rescoring, badge and chart jobs queued by the forms.
+    conn = get_db_connection()
+    processed = 0
+    while True:
+        if jobs.run_next(conn, JOB_HANDLERS):
+            processed += 1
+        elif once:
+            break
+        else:
+            time.sleep(poll)
+    print(f'Processed {processed} jobs.')
 
 @app.route('/')  # Set '/' to point to signup
 def root():
@@ -581,13 +634,12 @@ def global_leaderboard():
     if 'username' not in session:
         return redirect(url_for('login'))  # Redirect to login if not authenticated
 
-    update_leaderboard()  # Update the leaderboard data
-
-    # Fetch the data for the global leaderboard
+    # Fetch the data for the global leaderboard (kept current by the insert paths)
     global_leaderboard_data = fetch_global_leaderboard()
 
-    # Render the global leaderboard template with the fetched data
-    return render_template('GlobalLeaderboard.html', leaderboard=global_leaderboard_data)
+    # Render the global leaderboard template with the fetched data and the user's own rank
+    return render_template('GlobalLeaderboard.html', leaderboard=global_leaderboard_data,
+                           my_rank=fetch_rank(session['username']))
 
 @app.route('/followed_leaderboard')
 def followed_leaderboard():
@@ -597,13 +649,12 @@ def followed_leaderboard():
 
     current_user = session['username']  # Get the current logged-in user
 
-    update_leaderboard()  # Update the leaderboard data
-
     # Fetch the data for the followed leaderboard based on the current user
     followed_leaderboard_data = fetch_followed_leaderboard(current_user)
 
-    # Render the followed leaderboard template with the fetched data
-    return render_template('FollowedLeaderboard.html', leaderboard=followed_leaderboard_data)
+    # Render the followed leaderboard template with the fetched data and the user's rank among friends
+    return render_template('FollowedLeaderboard.html', leaderboard=followed_leaderboard_data,
+                           my_rank=fetch_followed_rank(current_user, current_user))
 
 
 @app.route('/search', methods=['GET'])
@@ -618,13 +669,98 @@ def search_user():
     # Strips whitespace from the search query.
     username = query.strip()
 
-    # Checks if the logged-in user is searching for their own profile and redirects accordingly.
-    if 'username' in session and session['username'] == username:
-        return redirect(url_for('user_profile', username=username))
+    # Goes to the case-insensitive exact match if there is one, else to the closest (first) match.
+    # With no match at all the profile page reports the user as not found.
+    matches = search_usernames(username, app.config['USER_SEARCH_LIMIT'])
+    exact = [match for match in matches if match.lower() == username.lower()]
+    if exact or matches:
+        username = (exact or matches)[0]
 
     # Redirects to the user profile page for the searched username.
     return redirect(url_for('user_profile', username=username))
 
+def requested_leaderboard_cursor():
+    # Keyset cursor "<achievement_points>.<id>" from ?cursor=, or None; raises ValueError if malformed
+    if not request.args.get('cursor'):
+        return None
+    points, row_id = request.args['cursor'].rsplit('.', 1)
+    return float(points), int(row_id)
+
+# Ranked leaderboard pages: ?scope=global (default) or followed, ?cursor= from the previous page's
+# next_cursor, and ?limit= (at most 100).
+@app.route('/api/leaderboard')
+def leaderboard_data():
+    if 'username' not in session:
+        return jsonify(error='Not logged in'), 401
+
+    scope = request.args.get('scope', 'global')
+    if scope not in ('global', 'followed'):
+        return jsonify(error='scope must be global or followed'), 400
+    try:
+        cursor = requested_leaderboard_cursor()
+        limit = min(max(int(request.args.get('limit', 50)), 1), 100)
+    except ValueError:
+        return jsonify(error='Invalid cursor or limit'), 400
+
+    if scope == 'global':
+        entries, next_cursor = fetch_leaderboard_page(cursor, limit)
+    else:
+        entries, next_cursor = fetch_followed_leaderboard_page(session['username'], cursor, limit)
+
+    return jsonify(scope=scope, entries=entries,
+                   next_cursor=f'{next_cursor[0]}.{next_cursor[1]}' if next_cursor else None)
+
+# Where a user stands: ?username= (default: the logged-in user) and ?scope=global or followed
+# (ranked among the people the logged-in user follows, plus that user).
+@app.route('/api/leaderboard/rank')
+def leaderboard_rank_data():
+    if 'username' not in session:
+        return jsonify(error='Not logged in'), 401
+
+    scope = request.args.get('scope', 'global')
+    if scope not in ('global', 'followed'):
+        return jsonify(error='scope must be global or followed'), 400
+    username = request.args.get('username') or session['username']
+
+    if scope == 'global':
+        result = fetch_rank(username)
+    else:
+        result = fetch_followed_rank(session['username'], username)
+    if result is None:
+        return jsonify(error='User not found'), 404
+
+    rank, achievement_points = result
+    return jsonify(scope=scope, username=username, rank=rank, achievement_points=achievement_points)
+
+# Typeahead suggestions for the user search box: ?q=<partial username>.
+@app.route('/api/users/search')
+def user_search_data():
+    if 'username' not in session:
+        return jsonify(error='Not logged in'), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify(query=query, results=[])
+
+    usernames = search_usernames(query, app.config['USER_SEARCH_LIMIT'])
+    return jsonify(query=query, results=[
+        {'username': username, 'url': url_for('user_profile', username=username)} for username in usernames
+    ])
+
+def fetch_profile(username, viewer):
+    # Everything a profile page shows, in one read: the user row with its follower/following
+    # counters, whether viewer follows them, and their badge IDs (1 until badges are assigned).
+    # Scores and badges are kept current when transactions are written, so viewing never writes.
+    conn = get_db_connection()
+    return conn.execute('''SELECT u.id, u.username, u.follower_count, u.following_count,
+                                  EXISTS(SELECT 1 FROM follow_relationships
+                                         WHERE follower = :viewer AND following = u.username) AS is_following,
+                                  COALESCE(b.apbadgeid, 1) AS apbadgeid,
+                                  COALESCE(b.incomebadgeid, 1) AS incomebadgeid,
+                                  COALESCE(b.expensebadgeid, 1) AS expensebadgeid
+                           FROM users u
+                           LEFT JOIN user_badges b ON b.username = u.username
+                           WHERE u.username = :username''', {'username': username, 'viewer': viewer}).fetchone()
 
 @app.route('/user/', defaults={'username': None})
 @app.route('/user/<username>')
@@ -637,49 +773,19 @@ def user_profile(username):
     if username is None:
         username = session['username']
 
-    # Connect to the database
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Retrieve user details from the database
-    cur.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cur.fetchone()
+    # Retrieve the user, their counters, follow status and badges in one query
+    user = fetch_profile(username, session['username'])
 
     # If the user is not found, return a 404 error
     if user is None:
-        conn.close()
         return "User not found", 404
 
-    # Update the leaderboard and assign badges for the user
-    update_leaderboard_for_user(username)
-    assign_badges(username)
-
-    # Get the count of followers for the user
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE following = ?', (username,))
-    follower_count = cur.fetchone()[0]
-
-    # Get the count of users the user is following
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE follower = ?', (username,))
-    following_count = cur.fetchone()[0]
-
-    # Check if the logged-in user is following this user
-    logged_in_user = session['username']
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE follower = ? AND following = ?', (logged_in_user, username))
-    is_following = cur.fetchone()[0] > 0
-
-    # Retrieve the badge IDs for the user
-    cur.execute('''SELECT apbadgeid, incomebadgeid, expensebadgeid
-                   FROM user_badges
-                   WHERE username = ?''', (username,))
-    badge_ids = cur.fetchone() or (1, 1, 1)  # Default badge IDs if none found
-
-    badge_ids = [str(badge_id) for badge_id in badge_ids]  # Convert badge IDs to strings
-
-    conn.close()  # Close the database connection
+    badge_ids = [str(user['apbadgeid']), str(user['incomebadgeid']), str(user['expensebadgeid'])]
 
     # Render the user profile template with the retrieved data
-    return render_template('user_profile.html', user=user, follower_count=follower_count, following_count=following_count,
-                           is_following=is_following, badge_ids=badge_ids)
+    return render_template('user_profile.html', user=user, follower_count=user['follower_count'],
+                           following_count=user['following_count'], is_following=bool(user['is_following']),
+                           badge_ids=badge_ids)
 
 @app.route('/follow', methods=['POST'])
 def follow():
@@ -693,18 +799,14 @@ def follow():
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # Check if the user is already following the specified user.
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE follower = ? AND following = ?', (logged_in_user, user_to_follow))
-    followed = cur.fetchone()[0] > 0
-
-    # If already followed, unfollow; otherwise, follow the user.
-    if followed:
-        cur.execute('DELETE FROM follow_relationships WHERE follower = ? AND following = ?', (logged_in_user, user_to_follow))
-    else:
-        cur.execute('INSERT INTO follow_relationships (follower, following) VALUES (?, ?)', (logged_in_user, user_to_follow))
+    # Unfollow if already followed; otherwise follow. Both happen in one transaction with the
+    # triggers that adjust the follower/following counters.
+    cur.execute('DELETE FROM follow_relationships WHERE follower = ? AND following = ?', (logged_in_user, user_to_follow))
+    if cur.rowcount == 0:
+        cur.execute('INSERT OR IGNORE INTO follow_relationships (follower, following) VALUES (?, ?)', (logged_in_user, user_to_follow))
+    database.bump_cache_version(conn, 'leaderboard')  # Their followed leaderboard changed
 
     conn.commit()
-    conn.close()
 
     # Redirect back to the profile of the user being followed/unfollowed.
     return redirect(url_for('user_profile', username=user_to_follow))
@@ -718,45 +820,17 @@ def my_profile():
 
     username = session['username']
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Fetch the user's profile details.
-    cur.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = cur.fetchone()
+    # Fetch the user's profile details, follow stats and badges.
+    user = fetch_profile(username, username)
 
     if user is None:
-        conn.close()
         return "User not found", 404  # Return 404 if the user is not found.
 
-    update_leaderboard_for_user(username)  # Update leaderboard for the current user.
-    assign_badges(username)  # Assign badges based on user's activity.
-
-    # Get follower and following counts.
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE following = ?', (username,))
-    follower_count = cur.fetchone()[0]
-
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE follower = ?', (username,))
-    following_count = cur.fetchone()[0]
-
-    logged_in_user = session['username']
-    # Check if the logged-in user is following the profile being viewed.
-    cur.execute('SELECT COUNT(*) FROM follow_relationships WHERE follower = ? AND following = ?', (logged_in_user, username))
-    is_following = cur.fetchone()[0] > 0
-
-    # Fetch the badge IDs for the user.
-    cur.execute('''SELECT apbadgeid, incomebadgeid, expensebadgeid
-                   FROM user_badges
-                   WHERE username = ?''', (username,))
-    badge_ids = cur.fetchone() or (1, 1, 1)  # Default badge IDs if none found.
-
-    badge_ids = [str(badge_id) for badge_id in badge_ids]  # Convert badge IDs to strings for rendering.
-
-    conn.close()
+    badge_ids = [str(user['apbadgeid']), str(user['incomebadgeid']), str(user['expensebadgeid'])]
 
     # Render the profile page with user details and follow stats.
-    return render_template('my_profile.html', user=user, follower_count=follower_count,
-                           following_count=following_count, is_following=is_following,
+    return render_template('my_profile.html', user=user, follower_count=user['follower_count'],
+                           following_count=user['following_count'], is_following=bool(user['is_following']),
                            badge_ids=badge_ids)
 
 # Route for the summary page.
@@ -768,66 +842,146 @@ def summary():
 
     username = session['username']
 
-    # Fetch monthly expenses and incomes for the pie charts
-    monthly_expenses = fetch_current_month_expenses(username)
-    monthly_incomes = fetch_current_month_incomes(username)
+    # Fetch this month's per-category totals for the pie charts
+    monthly_expenses = fetch_category_totals('expenses', username, *month_window())
+    monthly_incomes = fetch_category_totals('income', username, *month_window())
 
-    # Fetch yearly expenses and incomes for the frequency polygons
-    yearly_expenses = fetch_current_year_expenses(username)
-    yearly_incomes = fetch_current_year_incomes(username)
+    # Fetch this year's per-month totals and lay them out as January..December series for the frequency polygons
+    year_start, year_end = year_window()
+    yearly_expenses = fetch_monthly_totals('expenses', username, year_start, year_end)
+    yearly_incomes = fetch_monthly_totals('income', username, year_start, year_end)
+    first_month, last_month = f'{year_start.year}-01', f'{year_start.year}-12'
+    expense_months, expense_totals = series.monthly_series(
+        [exp['month'] for exp in yearly_expenses], [exp['amount'] for exp in yearly_expenses], first_month, last_month)
+    income_months, income_totals = series.monthly_series(
+        [inc['month'] for inc in yearly_incomes], [inc['amount'] for inc in yearly_incomes], first_month, last_month)
 
-    # Format yearly expenses and incomes for frequency polygon generation
-    formatted_yearly_expenses = [{'date': exp['date'], 'amount': exp['amount']} for exp in yearly_expenses]
-    formatted_yearly_incomes = [{'date': inc['date'], 'amount': inc['amount']} for inc in yearly_incomes]
+    # Periods the charts cover, part of each chart's cache key
+    current_month = date.today().strftime('%Y-%m')
+    current_year = str(date.today().year)
 
     # Generate pie charts for the current month
     expense_pie_chart_filename = 'expense_pie_chart'
     income_pie_chart_filename = 'income_pie_chart'
 
-    generate_pie_chart(
+    expense_pie_chart_path = generate_pie_chart(
         monthly_expenses,
         'Monthly Expenses by Category',
         [exp['category'] for exp in monthly_expenses],
         expense_pie_chart_filename,
-        username
+        username,
+        period=current_month
     )
 
-    generate_pie_chart(
+    income_pie_chart_path = generate_pie_chart(
         monthly_incomes,
         'Monthly Incomes by Category',
         [inc['category'] for inc in monthly_incomes],
         income_pie_chart_filename,
-        username
+        username,
+        period=current_month
     )
 
     # Generate frequency polygons for the entire year
     expense_frequency_polygon_filename = 'expense_frequency_polygon'
     income_frequency_polygon_filename = 'income_frequency_polygon'
 
-    generate_frequency_polygon(
-        formatted_yearly_expenses,
+    expense_frequency_polygon_path = generate_frequency_polygon(
+        expense_months,
+        expense_totals,
         'Yearly Expense Frequency',
         expense_frequency_polygon_filename,
-        username
+        username,
+        period=current_year
     )
 
-    generate_frequency_polygon(
-        formatted_yearly_incomes,
+    income_frequency_polygon_path = generate_frequency_polygon(
+        income_months,
+        income_totals,
         'Yearly Income Frequency',
         income_frequency_polygon_filename,
-        username
+        username,
+        period=current_year
     )
 
-    # Render the summary page with the generated charts.
+    # Render the summary page with the generated charts (or placeholders while they render).
     return render_template(
         'Summary.html',
-        expense_pie_chart=url_for('static', filename=f'/home/budgetbadgersite/images/{username}/expense_pie_chart.png'),
-        income_pie_chart=url_for('static', filename=f'/home/budgetbadgersite/images/{username}/income_pie_chart.png'),
-        expense_frequency_polygon=url_for('static', filename=f'/home/budgetbadgersite/images/{username}/expense_frequency_polygon.png'),
-        income_frequency_polygon=url_for('static', filename=f'/home/budgetbadgersite/images/{username}/income_frequency_polygon.png'),
+        expense_pie_chart=chart_url(expense_pie_chart_path),
+        income_pie_chart=chart_url(income_pie_chart_path),
+        expense_frequency_polygon=chart_url(expense_frequency_polygon_path),
+        income_frequency_polygon=chart_url(income_frequency_polygon_path),
+        charts_pending=charts_pending(expense_pie_chart_path, income_pie_chart_path,
+                                      expense_frequency_polygon_path, income_frequency_polygon_path),
         username=username
     )
 
+def chart_data_response(payload):
+    # JSON response tagged with an ETag of its body, so unchanged chart data is answered with a 304
+    body = json.dumps(payload, separators=(',', ':'))
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha1(body.encode()).hexdigest())
+    response.headers['Cache-Control'] = 'private, no-cache'  # Revalidate every time; the ETag makes it cheap
+    return response.make_conditional(request)
+
+def requested_chart_table():
+    # The transaction table named by ?kind=, or None if it is not one of TRANSACTION_TABLES
+    return TRANSACTION_TABLES.get(request.args.get('kind', 'expenses'))
+
+# Per-category totals for a month (default: the current one), the data behind the pie charts.
+@app.route('/api/charts/monthly_categories')
+def monthly_categories_data():
+    if 'username' not in session:
+        return jsonify(error='Not logged in'), 401
+
+    table = requested_chart_table()
+    if table is None:
+        return jsonify(error='kind must be one of: ' + ', '.join(TRANSACTION_TABLES)), 400
+
+    try:
+        day = datetime.strptime(request.args['month'], '%Y-%m').date() if 'month' in request.args else None
+    except ValueError:
+        return jsonify(error='month must be YYYY-MM'), 400
+
+    start, end = month_window(day)
+    rows = fetch_category_totals(table, session['username'], start, end)
+    return chart_data_response({
+        'kind': table,
+        'period': start.strftime('%Y-%m'),
+        'categories': [row['category'] for row in rows],
+        'totals': [row['amount'] for row in rows],
+    })
+
+# Per-month totals for a year (default: the current one), or for ?year= through ?to_year=,
+# the data behind the frequency polygons.
+@app.route('/api/charts/yearly_totals')
+def yearly_totals_data():
+    if 'username' not in session:
+        return jsonify(error='Not logged in'), 401
+
+    table = requested_chart_table()
+    if table is None:
+        return jsonify(error='kind must be one of: ' + ', '.join(TRANSACTION_TABLES)), 400
+
+    try:
+        first_year = int(request.args['year']) if 'year' in request.args else date.today().year
+        last_year = int(request.args['to_year']) if 'to_year' in request.args else first_year
+        start, end = date(first_year, 1, 1), date(last_year + 1, 1, 1)
+    except ValueError:
+        return jsonify(error='year and to_year must be YYYY'), 400
+    if last_year < first_year:
+        return jsonify(error='to_year must not be before year'), 400
+
+    rows = fetch_monthly_totals(table, session['username'], start, end)
+    months, totals = series.monthly_series([row['month'] for row in rows], [row['amount'] for row in rows],
+                                           f'{first_year}-01', f'{last_year}-12')
+    return chart_data_response({
+        'kind': table,
+        'period': str(first_year) if last_year == first_year else f'{first_year}-{last_year}',
+        'months': months,
+        'totals': totals,
+    })
+
 # Route for the sign up page.
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -841,8 +995,12 @@ def signup():
         conn = get_db_connection()
         conn.execute('''INSERT INTO users (username, email, password) VALUES (?, ?, ?)''',
                      (username, email, hashed_password))
+        # Seed the leaderboard and badge rows so new users show up without a full rebuild.
+        conn.execute('INSERT OR IGNORE INTO leaderboard (username, achievement_points) VALUES (?, 0)', (username,))
+        conn.execute('INSERT OR IGNORE INTO user_badges (username) VALUES (?)', (username,))
+        database.bump_cache_version(conn, 'leaderboard')  # The new user can appear on the global leaderboard
         conn.commit()
-        conn.close()
+        user_search_cache.bump()  # The new user can appear in search results
 
         # Redirect to the login page after successful signup.
         return redirect(url_for('login'))
@@ -861,7 +1019,6 @@ def login():
 
         # Fetch the user based on the provided username.
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
 
         if user:
             # Check if the provided password matches the hashed password in the database.
@@ -886,48 +1043,54 @@ def home():
 
     username = session['username']  # Get the current logged-in username
 
-    piechart_expenses = fetch_current_month_expenses(username)
-    piechart_incomes = fetch_current_month_incomes(username)
+    # Fetch this month's per-category totals for the pie charts
+    piechart_expenses = fetch_category_totals('expenses', username, *month_window())
+    piechart_incomes = fetch_category_totals('income', username, *month_window())
 
     # Fetch recent income and expense records, limiting to the latest 4 each
     recent_incomes = fetch_recent_incomes_from_db(username, limit=4)
     recent_expenses = fetch_recent_expenses_from_db(username, limit=4)
 
-    # Define filenames for the pie chart images
+    # Define filenames for the pie chart images and the month they cover
+    current_month = date.today().strftime('%Y-%m')
     income_pie_chart_filename = 'income_pie_chart'
     expense_pie_chart_filename = 'expense_pie_chart'
 
     # Generate pie charts for the recent incomes and expenses
-    generate_pie_chart(
+    income_pie_chart_path = generate_pie_chart(
         piechart_incomes,
         'Monthly Incomes by Category',
         [inc['category'] for inc in recent_incomes],
         income_pie_chart_filename,
-        username
+        username,
+        period=current_month
     )
 
-    generate_pie_chart(
+    expense_pie_chart_path = generate_pie_chart(
         piechart_expenses,
         'Monthly Expenses by Category',
         [exp['category'] for exp in recent_expenses],
         expense_pie_chart_filename,
-        username
+        username,
+        period=current_month
     )
 
-    # Create file paths for the pie charts using the serve_static route
-    income_pie_chart_path = url_for('static', filename=f'images/{username}/{income_pie_chart_filename}.png')
-    expense_pie_chart_path = url_for('static', filename=f'images/{username}/{expense_pie_chart_filename}.png')
-
     # Render the home template with recent incomes, expenses, and username
     return render_template(
         'Home.html',
         incomes=recent_incomes,
         expenses=recent_expenses,
         username=username,
-        income_pie_chart=income_pie_chart_path,
-        expense_pie_chart=expense_pie_chart_path
+        income_pie_chart=chart_url(income_pie_chart_path),
+        expense_pie_chart=chart_url(expense_pie_chart_path),
+        charts_pending=charts_pending(income_pie_chart_path, expense_pie_chart_path)
     )
 
+def normalize_date(value):
+    # The 'YYYY-MM-DD' form of a submitted date, as stored in the transaction tables, where dates
+    # are compared as text. Raises ValueError for anything that is not an ISO date.
+    return date.fromisoformat(value.strip()).isoformat()
+
 #  Route for the expense form.
 @app.route('/expense_form', methods=['GET', 'POST'])
 def expense_form():
@@ -938,7 +1101,10 @@ def expense_form():
     # Handle form submission
     if request.method == 'POST':
         username = session['username']
-        date = request.form['date']  # Get the date from the form
+        try:
+            date = normalize_date(request.form['date'])  # Get the date from the form
+        except ValueError:
+            return "Date must be YYYY-MM-DD", 400
         try:
             amount = float(request.form['amount'])  # Convert amount to float
         except ValueError:
@@ -956,12 +1122,10 @@ def expense_form():
         conn.execute('''INSERT INTO expenses (username, date, amount, category, description)
                          VALUES (?, ?, ?, ?, ?)''',
                      (username, date, amount, category, description))
-        conn.commit()  # Commit the transaction
-        conn.close()  # Close the database connection
-
-        # Update leaderboard and assign badges to the user
-        update_leaderboard()
-        assign_badges(username)
+        scoring.record_activity(conn, username, date)  # Advance the user's daily streak
+        enqueue_refresh(conn, username)  # Rescoring, badges and stale charts are left to the job worker
+        conn.commit()  # Commit the row, its streak and the jobs together
+        run_inline_jobs()
 
         return redirect(url_for('transaction'))  # Redirect to transaction page
 
@@ -977,7 +1141,10 @@ def income_form():
     # Handle form submission
     if request.method == 'POST':
         username = session['username']
-        date = request.form['date']  # Get the date from the form
+        try:
+            date = normalize_date(request.form['date'])  # Get the date from the form
+        except ValueError:
+            return "Date must be YYYY-MM-DD", 400
         amount = float(request.form['amount'])  # Convert amount to float
         category = request.form['category']  # Get category from the form
         description = request.form['description']  # Get description from the form
@@ -986,13 +1153,8 @@ def income_form():
         if amount < 0.01:
             return "Amount must be at least 0.01", 400
 
-        # Define valid income categories
-        valid_categories = [
-            'Salary', 'Business', 'Investments', 'Gifts',
-            'Extra Income', 'Loan', 'Insurance Payout', 'Other Incomes'
-        ]
         # Check if the selected category is valid
-        if category not in valid_categories:
+        if category not in database.INCOME_CATEGORIES:
             return "Invalid category", 400
 
         # Connect to the database and insert the income record
@@ -1001,20 +1163,207 @@ def income_form():
             conn.execute('''INSERT INTO income (username, date, amount, category, description)
                              VALUES (?, ?, ?, ?, ?)''',
                          (username, date, amount, category, description))
-            conn.commit()  # Commit the transaction
+            scoring.record_activity(conn, username, date)  # Advance the user's daily streak
+            enqueue_refresh(conn, username)  # Rescoring, badges and stale charts are left to the job worker
+            conn.commit()  # Commit the row, its streak and the jobs together
         except sqlite3.IntegrityError as e:
+            conn.rollback()  # Discard the failed insert so the shared connection stays usable
             return f"IntegrityError: {e}", 400  # Return error for integrity issues
-        finally:
-            conn.close()  # Close the database connection
 
-        # Update leaderboard and assign badges to the user
-        update_leaderboard()
-        assign_badges(username)
+        run_inline_jobs()
 
         return redirect(url_for('transaction'))  # Redirect to transaction page
 
     return render_template('incomeform.html')  # Render income form
 
+IMPORT_TYPES = {
+    'income': ('income', database.INCOME_CATEGORIES),
+    'expense': ('expenses', database.EXPENSE_CATEGORIES),
+    'expenses': ('expenses', database.EXPENSE_CATEGORIES),
+}
+
+def parse_import_row(row):
+    # Validate one CSV row against the same rules as the forms and the table CHECK constraints.
+    # Returns (table, date, amount, category, description) or raises ValueError with the reason.
+    # Without a type column the sign of the amount decides, as in a bank statement export.
+    try:
+        amount = float((row.get('amount') or '').replace(',', ''))
+    except ValueError:
+        raise ValueError('invalid amount')
+    if not math.isfinite(amount):  # float() accepts 'nan' and 'inf'
+        raise ValueError('invalid amount')
+
+    kind = (row.get('type') or '').strip().lower()
+    if not kind:
+        kind = 'expense' if amount < 0 else 'income'
+        amount = abs(amount)
+    if kind not in IMPORT_TYPES:
+        raise ValueError(f"unknown type '{kind}'")
+    table, categories = IMPORT_TYPES[kind]
+
+    try:
+        day = normalize_date(row.get('date') or '')
+    except ValueError:
+        raise ValueError('date must be YYYY-MM-DD')
+
+    if amount < 0.01:
+        raise ValueError('amount must be at least 0.01')
+
+    category = (row.get('category') or '').strip()
+    if category not in categories:
+        raise ValueError(f"invalid {kind} category '{category}'")
+
+    return table, day, amount, category, (row.get('description') or '').strip()
+
+def insert_import_chunk(conn, username, rows):
+    # Insert one chunk of parsed rows in a single transaction; the rollup triggers fire per row.
+    with conn:
+        for table in ('income', 'expenses'):
+            values = [(username, day, amount, category, description)
+                      for row_table, day, amount, category, description in rows if row_table == table]
+            if values:
+                conn.executemany(f'''INSERT INTO {table} (username, date, amount, category, description)
+                                      VALUES (?, ?, ?, ?, ?)''', values)
+
+# Route for bulk importing transactions from a CSV file.
+@app.route('/import', methods=['POST'])
+def import_transactions():
+    # Stream the uploaded CSV (header: date, amount, category and optionally type, description),
+    # insert valid rows in chunks and rescore the user once at the end. Returns a JSON report.
+    if 'username' not in session:
+        return redirect(url_for('login'))
+
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    username = session['username']
+    chunk_size = app.config['IMPORT_CHUNK_SIZE']
+    max_errors = app.config['IMPORT_MAX_REPORTED_ERRORS']
+    conn = get_db_connection()
+
+    reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames or not {'date', 'amount', 'category'} <= {name.strip().lower() for name in reader.fieldnames}:
+        return jsonify({'error': 'CSV header must include date, amount and category'}), 400
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+    imported = 0
+    error_count = 0
+    errors = []
+    chunk = []  # (line number, parsed row) pairs waiting to be inserted
+
+    def flush_chunk():
+        # Insert the pending chunk. If the database rejects it, the whole chunk is rolled back and
+        # reported against its lines, while chunks already committed still count as imported.
+        nonlocal imported, error_count
+        try:
+            insert_import_chunk(conn, username, [parsed for _, parsed in chunk])
+            imported += len(chunk)
+        except sqlite3.IntegrityError as e:
+            error_count += len(chunk)
+            if len(errors) < max_errors:
+                errors.append({'line': chunk[0][0], 'error': f'lines {chunk[0][0]}-{chunk[-1][0]} rejected: {e}'})
+        chunk.clear()
+
+    try:
+        for row in reader:
+            try:
+                chunk.append((reader.line_num, parse_import_row(row)))
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < max_errors:
+                    errors.append({'line': reader.line_num, 'error': str(e)})
+                continue
+
+            if len(chunk) >= chunk_size:
+                flush_chunk()
+    except (UnicodeDecodeError, csv.Error) as e:
+        error_count += 1
+        errors.append({'line': reader.line_num, 'error': f'unreadable file: {e}'})
+
+    if chunk:
+        flush_chunk()
+
+    if imported:
+        # Imported rows can land anywhere in the user's history, so rebuild their streak, then
+        # queue one rescore and chart refresh for the whole file, committing both together.
+        database.replace_streaks(conn, username)
+        enqueue_refresh(conn, username)
+        conn.commit()
+        run_inline_jobs()
+
+    return jsonify({'imported': imported, 'error_count': error_count, 'errors': errors})
+
+# Export formats: (mimetype, file extension). CSV uses the same columns the import accepts.
+EXPORT_FORMATS = {'csv': ('text/csv', 'csv'), 'ndjson': ('application/x-ndjson', 'ndjson')}
+EXPORT_COLUMNS = ('date', 'type', 'amount', 'category', 'description')
+EXPORT_TYPES = {'income': 'income', 'expenses': 'expense'}
+
+def export_lines(rows, export_format, flush_size=64 * 1024):
+    # Encode transaction rows as CSV or NDJSON text, yielded in chunks of about flush_size characters.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+
+    for day, kind, _, amount, category, description in rows:
+        values = (day, EXPORT_TYPES[kind], amount, category, description)
+        if export_format == 'csv':
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))) + '\n')
+
+        if buffer.tell() >= flush_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def requested_transaction_filters():
+    # The ?filter, ?start, ?end (inclusive), ?category, ?min_amount and ?max_amount parameters
+    # shared by the transaction page and the export, as (tables, keyword arguments for
+    # transaction_conditions) with end exclusive. Raises ValueError for malformed values.
+    tables = {'incomes': ('income',), 'expenses': ('expenses',)}.get(request.args.get('filter'), ('income', 'expenses'))
+    start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+    end = None
+    if request.args.get('end'):
+        end = date.fromisoformat(request.args['end'])
+        # The day after date.max does not exist, and no stored date can be later anyway
+        end = end + timedelta(days=1) if end < date.max else None
+    return tables, {
+        'start': start,
+        'end': end,
+        'category': request.args.get('category') or None,
+        'min_amount': float(request.args['min_amount']) if request.args.get('min_amount') else None,
+        'max_amount': float(request.args['max_amount']) if request.args.get('max_amount') else None,
+    }
+
+# Route for downloading the user's transactions.
+@app.route('/export', methods=['GET'])
+def export_transactions():
+    # Stream the user's transactions as ?format=csv (default) or ndjson, limited by the same filters
+    # as the transaction page (see requested_transaction_filters), so an export matches the view.
+    if 'username' not in session:
+        return redirect(url_for('login'))
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return "Invalid format", 400
+
+    try:
+        tables, filters = requested_transaction_filters()
+    except ValueError:
+        return "Invalid filter", 400
+
+    username = session['username']
+    rows = iter_transactions(username, tables, **filters)
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    headers = {'Content-Disposition': f'attachment; filename="{username}-transactions.{extension}"'}
+
+    # stream_with_context keeps the request (and its database connection) open while the body is sent
+    return Response(stream_with_context(export_lines(rows, export_format)), mimetype=mimetype, headers=headers)
+
 # Route for the transaction page.
 @app.route('/transaction', methods=['GET'])
 def transaction():
@@ -1025,17 +1374,33 @@ def transaction():
     filter_option = request.args.get('filter', 'all')  # Get filter option from query parameters
     username = session['username']
 
-    # Fetch incomes and expenses from the database
-    incomes = fetch_incomes_from_db(username)
-    expenses = fetch_expenses_from_db(username)
+    # Which tables to list and optional narrowing filters, all applied in SQL rather than by
+    # discarding rows afterwards
+    try:
+        tables, filters = requested_transaction_filters()
+    except ValueError:
+        return "Invalid filter", 400
+
+    # Keyset cursor from the previous page: "<date>.<kind>.<id>" of its last row
+    cursor = None
+    if request.args.get('cursor'):
+        try:
+            cursor_date, cursor_kind, cursor_id = request.args['cursor'].rsplit('.', 2)
+            cursor = (cursor_date, cursor_kind, int(cursor_id))
+        except ValueError:
+            return "Invalid cursor", 400
+
+    transactions, next_cursor = fetch_transaction_page(
+        username, tables, cursor=cursor, limit=app.config['TRANSACTIONS_PER_PAGE'], **filters
+    )
 
-    # Filter incomes or expenses based on the selected option
-    if filter_option == 'incomes':
-        expenses = []  # Clear expenses if filtering by incomes
-    elif filter_option == 'expenses':
-        incomes = []  # Clear incomes if filtering by expenses
+    # Link to the next page, keeping the current filters
+    next_page = None
+    if next_cursor is not None:
+        next_args = {key: value for key, value in request.args.items() if key != 'cursor'}
+        next_page = url_for('transaction', cursor='.'.join(str(part) for part in next_cursor), **next_args)
 
-    return render_template('Transaction.html', incomes=incomes, expenses=expenses, filter=filter_option)
+    return render_template('Transaction.html', transactions=transactions, next_page=next_page, filter=filter_option)
 
 # Route to logout
 @app.route('/logout')
@@ -0,0 +1,105 @@
+# Micro-benchmark of chart rendering: the original pyplot renderer (dpi=300, tight_layout)
+# against charts.py for each preset and for SVG output. The 'dpi 300' rows run charts.py at the
+# legacy figure size and resolution, so comparing them with the legacy rows measures the reusable
+# Figure/FigureCanvasAgg renderer alone, without the smaller presets. Run from the repository root:
+#
+#     python -m benchmarks.chart_render [--repeat N]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import charts
+import series
+from benchmarks.monthly_series import legacy_monthly_totals
+
+def legacy_pie_chart(file_path, amounts, categories, title):
+    # The pyplot renderer this app used before charts.py
+    plt.figure(figsize=(8, 6))
+    label_font = {'fontsize': 17, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': '#c0e2df'}
+    plt.pie(amounts, labels=categories, autopct=lambda p: f'{p:.1f}%', startangle=140,
+            textprops=label_font, pctdistance=0.85)
+    for text in plt.gca().texts:
+        text.set_fontsize(15)
+        text.set_fontfamily('serif')
+        text.set_fontweight('normal')
+        text.set_color('#c0e2df')
+    plt.title(title, fontsize=25, fontfamily='serif', fontweight='bold', color='#c0e2df')
+    plt.savefig(file_path, dpi=300, transparent=True)
+    plt.close()
+
+def legacy_frequency_polygon(file_path, data, title):
+    amounts = legacy_monthly_totals(data)
+    plt.figure(figsize=(21, 14))
+    plt.plot(charts.MONTH_LABELS, amounts, marker='o', linestyle='-', color='#39FF14')
+    plt.title(title, fontsize=50, fontfamily='serif', fontweight='bold', color='#c0e2df')
+    plt.xlabel('Month', fontsize=40, fontfamily='serif', fontweight='bold', color='#c0e2df')
+    plt.ylabel('Amount', fontsize=40, fontfamily='serif', fontweight='bold', color='#c0e2df')
+    plt.xticks(ticks=range(12), labels=charts.MONTH_LABELS, rotation=45)
+    plt.tick_params(axis='x', labelsize=30, colors='#c0e2df')
+    plt.tick_params(axis='y', labelsize=30, colors='#c0e2df')
+    ax = plt.gca()
+    for spine in ax.spines.values():
+        spine.set_color('#c0e2df')
+    plt.grid(color='gray', linestyle='--', linewidth=0.7)
+    plt.tight_layout()
+    plt.savefig(file_path, dpi=300, transparent=True)
+    plt.close()
+
+def sample_data(seed=0):
+    rng = random.Random(seed)
+    categories = ['Groceries', 'Transport', 'Shopping', 'Bills & Fees', 'Entertainment']
+    pie = ([rng.uniform(10, 500) for _ in categories], categories)
+    polygon = [{'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', 'amount': rng.uniform(1, 300)}
+               for _ in range(200)]
+    months, totals = series.monthly_series([row['date'] for row in polygon], [row['amount'] for row in polygon],
+                                           '2024-01', '2024-12')
+    return pie, polygon, (months, totals)
+
+def measure(render, file_path, repeat):
+    # Best-of-N wall time in milliseconds, and the size of the written file
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, os.path.getsize(file_path)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Benchmark-only preset matching the legacy renderer's figure size and dpi=300
+    for chart_presets in charts.PRESETS.values():
+        chart_presets['dpi 300'] = dict(chart_presets['full'], dpi=300)
+
+    (amounts, categories), polygon_data, (months, totals) = sample_data()
+    cases = [
+        ('pie', 'legacy pyplot', 'png', lambda path: legacy_pie_chart(path, amounts, categories, 'Monthly Expenses')),
+        ('pie', 'dpi 300', 'png', lambda path: charts.render_pie_chart(path, amounts, categories, 'Monthly Expenses', preset='dpi 300')),
+        ('pie', 'full', 'png', lambda path: charts.render_pie_chart(path, amounts, categories, 'Monthly Expenses')),
+        ('pie', 'thumbnail', 'png', lambda path: charts.render_pie_chart(path, amounts, categories, 'Monthly Expenses', preset='thumbnail')),
+        ('pie', 'full', 'svg', lambda path: charts.render_pie_chart(path, amounts, categories, 'Monthly Expenses')),
+        ('polygon', 'legacy pyplot', 'png', lambda path: legacy_frequency_polygon(path, polygon_data, 'Yearly Expenses')),
+        ('polygon', 'dpi 300', 'png', lambda path: charts.render_frequency_polygon(path, months, totals, 'Yearly Expenses', preset='dpi 300')),
+        ('polygon', 'full', 'png', lambda path: charts.render_frequency_polygon(path, months, totals, 'Yearly Expenses')),
+        ('polygon', 'thumbnail', 'png', lambda path: charts.render_frequency_polygon(path, months, totals, 'Yearly Expenses', preset='thumbnail')),
+        ('polygon', 'full', 'svg', lambda path: charts.render_frequency_polygon(path, months, totals, 'Yearly Expenses')),
+    ]
+
+    print(f'{"chart":<8} {"renderer":<14} {"format":<6} {"time (ms)":>10} {"size (KB)":>10}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for chart, renderer, output_format, render in cases:
+            file_path = os.path.join(tmp, f'{chart}-{renderer.replace(" ", "-")}.{output_format}')
+            elapsed_ms, size = measure(render, file_path, args.repeat)
+            print(f'{chart:<8} {renderer:<14} {output_format:<6} {elapsed_ms:10.1f} {size / 1024:10.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Compares the monthly series builder (series.monthly_series: datetime64[M] offsets and a weighted
+# np.bincount) with the pandas resample/merge path charts.py used before it, which only covered
+# the months of 2024. Both are fed the same 2024 rows, so their totals must agree. Run from the
+# repository root:
+#
+#     python -m benchmarks.monthly_series [--sizes 200,10000,1000000] [--repeat N]
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+import series
+
+def legacy_monthly_totals(data):
+    # The pandas implementation previously in charts.monthly_totals, kept here for comparison
+    df = pd.DataFrame(data, columns=['date', 'amount'])
+    df['date'] = pd.to_datetime(df['date'])
+    df.set_index('date', inplace=True)
+    totals = df.resample('ME').sum().reset_index()
+
+    all_months = pd.date_range(start='2024-01-01', end='2024-12-31', freq='ME')
+    all_months_df = pd.DataFrame({'date': all_months})
+    all_months_df['month'] = all_months_df['date'].dt.strftime('%b')
+    all_months_df['amount'] = 0
+
+    totals['month'] = totals['date'].dt.strftime('%b')
+    merged_df = pd.merge(all_months_df, totals, on='month', suffixes=('_all', '_actual'), how='left')
+    return merged_df['amount_actual'].fillna(0).tolist()
+
+def numpy_monthly_totals(data):
+    # The same rows through series.monthly_series
+    _, totals = series.monthly_series([row['date'] for row in data], [row['amount'] for row in data],
+                                      '2024-01', '2024-12')
+    return totals
+
+def sample_rows(size, seed=0):
+    rng = random.Random(seed)
+    return [{'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', 'amount': round(rng.uniform(1, 300), 2)}
+            for _ in range(size)]
+
+def best_ms(function, data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='12,200,10000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"rows":>9} {"pandas (ms)":>12} {"numpy (ms)":>11} {"speed-up":>9}  totals agree')
+    for size in (int(value) for value in args.sizes.split(',')):
+        data = sample_rows(size)
+        agree = all(abs(a - b) < 1e-6 for a, b in zip(legacy_monthly_totals(data), numpy_monthly_totals(data)))
+        legacy_ms = best_ms(legacy_monthly_totals, data, args.repeat)
+        numpy_ms = best_ms(numpy_monthly_totals, data, args.repeat)
+        print(f'{size:>9} {legacy_ms:12.3f} {numpy_ms:11.3f} {legacy_ms / numpy_ms:8.1f}x  {agree}')
+
+if __name__ == '__main__':
+    main()
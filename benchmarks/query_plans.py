@@ -0,0 +1,75 @@
+# Shows the query plans (and timings) of the app's hot queries before and after the
+# schema migrations. Run from the repository root:
+#
+#     python -m benchmarks.query_plans [--users N] [--rows-per-user N]
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import database
+
+QUERIES = [
+    ('user incomes', 'SELECT * FROM income WHERE username = ?', ('user42',)),
+    ('user expenses', 'SELECT * FROM expenses WHERE username = ?', ('user42',)),
+    ('recent incomes', 'SELECT * FROM income WHERE username = ? ORDER BY date DESC LIMIT 4', ('user42',)),
+    ('recent expenses', 'SELECT * FROM expenses WHERE username = ? ORDER BY date DESC LIMIT 4', ('user42',)),
+    ('follower count', 'SELECT COUNT(*) FROM follow_relationships WHERE following = ?', ('user42',)),
+    ('global top 10', 'SELECT username, achievement_points FROM leaderboard ORDER BY achievement_points DESC LIMIT 10', ()),
+    ('followed top 10', '''SELECT l.username, l.achievement_points
+                           FROM leaderboard l
+                           JOIN follow_relationships f ON l.username = f.following
+                           WHERE f.follower = ?
+                           ORDER BY l.achievement_points DESC
+                           LIMIT 10''', ('user42',)),
+]
+
+def populate(conn, users, rows_per_user, seed=0):
+    rng = random.Random(seed)
+    usernames = [f'user{i}' for i in range(users)]
+    conn.executemany('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                     ((name, f'{name}@example.com', 'x') for name in usernames))
+    conn.executemany('INSERT INTO income (username, date, amount, category) VALUES (?, ?, ?, ?)',
+                     ((name, f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.randint(1, 5000), 'Salary')
+                      for name in usernames for _ in range(rows_per_user)))
+    conn.executemany('INSERT INTO expenses (username, date, amount, category) VALUES (?, ?, ?, ?)',
+                     ((name, f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.randint(1, 500), 'Groceries')
+                      for name in usernames for _ in range(rows_per_user)))
+    conn.executemany('INSERT OR IGNORE INTO follow_relationships (follower, following) VALUES (?, ?)',
+                     ((name, rng.choice(usernames)) for name in usernames for _ in range(5)))
+    conn.executemany('INSERT INTO leaderboard (username, achievement_points) VALUES (?, ?)',
+                     ((name, rng.randint(0, 60000)) for name in usernames))
+    conn.commit()
+
+def report(conn, label):
+    print(f'== {label} (schema version {conn.execute("PRAGMA user_version").fetchone()[0]}) ==')
+    for name, sql, params in QUERIES:
+        plan = '; '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        start = time.perf_counter()
+        for _ in range(20):
+            conn.execute(sql, params).fetchall()
+        elapsed_ms = (time.perf_counter() - start) / 20 * 1000
+        print(f'{name:<16} {elapsed_ms:8.3f} ms  {plan}')
+    print()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rows-per-user', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        database.create_tables(conn)
+        populate(conn, args.users, args.rows_per_user)
+
+        report(conn, 'before migrations')
+        database.migrate(conn)
+        report(conn, 'after migrations')
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Times the app's main pages and form posts through Flask's test client against a synthetic
+# database, and prints a JSON report with p50/p95 latencies per route so runs can be compared.
+# Charts render inline (CHART_RENDER_WORKERS = 0) into a temporary folder, so chart cost shows up
+# in /home and /summary. Run from the repository root:
+#
+#     python -m benchmarks.routes [--scale small|medium|large] [--requests N] [--seed N]
+#                                 [--database PATH] [--output FILE]
+#
+# With --database the synthetic database is created at PATH on the first run and reused after,
+# which saves regenerating the large scale every time.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+from benchmarks import synthetic
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarise(timings_ms):
+    timings_ms = sorted(timings_ms)
+    return {
+        'n': len(timings_ms),
+        'p50_ms': round(percentile(timings_ms, 0.50), 3),
+        'p95_ms': round(percentile(timings_ms, 0.95), 3),
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 3),
+        'max_ms': round(timings_ms[-1], 3),
+    }
+
+def build_cases(rng, users):
+    # (name, method, path function, form data function); each call picks a random user to act as
+    def someone():
+        return synthetic.username(rng.randrange(users))
+
+    def transaction_form(categories):
+        return lambda: {'date': date.today().isoformat(), 'amount': f'{rng.uniform(1, 500):.2f}',
+                        'category': rng.choice(categories), 'description': 'benchmark'}
+
+    return [
+        ('GET /home', 'GET', lambda: '/home', None),
+        ('GET /summary', 'GET', lambda: '/summary', None),
+        ('GET /transaction', 'GET', lambda: '/transaction', None),
+        ('GET /global_leaderboard', 'GET', lambda: '/global_leaderboard', None),
+        ('GET /followed_leaderboard', 'GET', lambda: '/followed_leaderboard', None),
+        ('GET /user/<name>', 'GET', lambda: f'/user/{someone()}', None),
+        ('POST /income_form', 'POST', lambda: '/income_form', transaction_form(synthetic.database.INCOME_CATEGORIES)),
+        ('POST /expense_form', 'POST', lambda: '/expense_form', transaction_form(synthetic.database.EXPENSE_CATEGORIES)),
+    ]
+
+def run(database_path, chart_folder, requests, seed, users):
+    import app as budget_app
+
+    flask_app = budget_app.app
+    flask_app.config.update(DATABASE=database_path, CHART_FOLDER=chart_folder, CHART_RENDER_WORKERS=0)
+    client = flask_app.test_client()
+    rng = random.Random(seed)
+
+    results = {}
+    for name, method, path, form in build_cases(rng, users):
+        timings = []
+        for _ in range(requests):
+            # Each request acts as a different logged-in user, as on a busy site
+            with client.session_transaction() as session:
+                session['username'] = synthetic.username(rng.randrange(users))
+            url = path()
+            data = form() if form else None
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name} returned {response.status_code}')
+        results[name] = summarise(timings)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=synthetic.SCALES, default='small')
+    parser.add_argument('--requests', type=int, default=50, help='requests timed per route')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='synthetic database to create or reuse (default: a temporary one)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.abspath(args.database) if args.database else os.path.join(tmp, 'benchmark.db')
+        if os.path.exists(database_path):
+            dataset = {'scale': args.scale, 'reused': database_path}
+        else:
+            dataset = synthetic.generate(database_path, args.scale, args.seed)
+
+        # Time against a copy so the form posts never change the reusable dataset
+        working_path = os.path.join(tmp, 'working.db')
+        with sqlite3.connect(database_path) as source, sqlite3.connect(working_path) as target:
+            source.backup(target)
+        users = sqlite3.connect(working_path).execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+        routes = run(working_path, os.path.join(tmp, 'charts'), args.requests, args.seed, users)
+
+    report = {
+        'dataset': dataset,
+        'requests_per_route': args.requests,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'routes': routes,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Cold-start cost of the web app: wall time of `import app` in a fresh interpreter, and the
+# slowest imports from `python -X importtime`. The app should start without loading the
+# dataframe and plotting libraries, which are only needed once a chart or batch rescore runs.
+# Run from the repository root:
+#
+#     python -m benchmarks.startup [--repeat N] [--top N] [--check]
+#
+# --check exits with status 1 if any module in HEAVY_MODULES is imported at startup.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_import(code, cwd, importtime=False):
+    # Run `code` in a fresh interpreter; returns (wall time in ms, stderr)
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) * 1000, result.stderr
+
+def parse_importtime(stderr):
+    # (module, self us, cumulative us, nesting depth) per line of -X importtime output
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The database is created on the first connection, so the first run opens one; plain
+        # imports after that do not touch the database at all
+        first_ms, _ = run_import('import app\nwith app.app.app_context(): app.get_db_connection()', tmp)
+        warm_ms = sorted(run_import('import app', tmp)[0] for _ in range(args.repeat))
+        chart_ms, _ = run_import('import app, charts, series; series.monthly_series([], [], "2024-01", "2024-12"); charts._figure("pie", "full")', tmp)
+        _, stderr = run_import('import app', tmp, importtime=True)
+
+    rows = parse_importtime(stderr)
+    loaded = {name.split('.')[0] for name, _, _, _ in rows}
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+
+    print(f'first start (creates schema) {first_ms:8.1f} ms')
+    print(f'warm start, median of {args.repeat:<3}  {warm_ms[len(warm_ms) // 2]:8.1f} ms')
+    print(f'start plus chart libraries   {chart_ms:8.1f} ms')
+    print(f'heavy modules at startup     {", ".join(heavy) or "none"}')
+    print()
+
+    # Top-level imports (those the app and its modules trigger directly), slowest first
+    top_level = sorted((row for row in rows if row[3] <= 1), key=lambda row: row[2], reverse=True)
+    print(f'{"module":<32} {"cumulative (ms)":>16} {"self (ms)":>10}')
+    for name, self_us, cumulative_us, _ in top_level[:args.top]:
+        print(f'{name:<32} {cumulative_us / 1000:16.1f} {self_us / 1000:10.1f}')
+
+    if args.check and heavy:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# Seeded synthetic data for the benchmarks: users, income, expenses and follow relationships at a
+# few fixed scales, written into a fresh database through the normal schema (so the rollup
+# triggers and follower counters are filled in as they would be in production), followed by a
+# full streak and leaderboard rebuild. Transactions fall in the two years up to today, so the
+# current-month and current-year pages have data; the same seed gives the same rows relative
+# to the run date. Run from the repository root:
+#
+#     python -m benchmarks.synthetic --scale small --output bench.db [--seed N]
+
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import database
+import scoring
+
+# users, transactions per user (split between income and expenses), follows per user
+SCALES = {
+    'small': {'users': 1000, 'rows_per_user': 100, 'follows_per_user': 10},      # 100k transactions
+    'medium': {'users': 10000, 'rows_per_user': 50, 'follows_per_user': 20},     # 500k transactions
+    'large': {'users': 100000, 'rows_per_user': 12, 'follows_per_user': 20},     # 1.2M transactions
+}
+
+PASSWORD = 'benchmark'  # Every synthetic user's password
+HISTORY_DAYS = 730
+CHUNK_SIZE = 10000
+
+def username(index):
+    return f'user{index}'
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _transactions(rng, users, rows_per_user, today):
+    # (table, username, date, amount, category, description) rows; roughly one in three is income
+    for index in range(users):
+        name = username(index)
+        for _ in range(rows_per_user):
+            day = (today - timedelta(days=int(rng.expovariate(1 / 120)) % HISTORY_DAYS)).isoformat()
+            if rng.random() < 0.35:
+                yield 'income', name, day, round(rng.uniform(50, 5000), 2), rng.choice(database.INCOME_CATEGORIES), 'synthetic'
+            else:
+                yield 'expenses', name, day, round(rng.uniform(1, 800), 2), rng.choice(database.EXPENSE_CATEGORIES), 'synthetic'
+
+def generate(path, scale='small', seed=0, users=None, rows_per_user=None, follows_per_user=None):
+    # Create a database at path (which must not exist yet) filled at the given scale; explicit
+    # counts override the preset. Returns a dict describing what was generated.
+    if os.path.exists(path):
+        raise FileExistsError(path)
+
+    settings = dict(SCALES[scale])
+    for key, value in (('users', users), ('rows_per_user', rows_per_user), ('follows_per_user', follows_per_user)):
+        if value is not None:
+            settings[key] = value
+
+    rng = random.Random(seed)
+    today = date.today()
+    started = time.perf_counter()
+
+    database.init_db(path)
+    conn = database.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')  # Throwaway database; durability is not needed while loading
+
+    password_hash = generate_password_hash(PASSWORD)
+    with conn:
+        conn.executemany('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                         ((username(i), f'{username(i)}@example.com', password_hash) for i in range(settings['users'])))
+
+    for chunk in _chunks(_transactions(rng, settings['users'], settings['rows_per_user'], today)):
+        with conn:
+            for table in ('income', 'expenses'):
+                conn.executemany(f'INSERT INTO {table} (username, date, amount, category, description) VALUES (?, ?, ?, ?, ?)',
+                                 (row[1:] for row in chunk if row[0] == table))
+
+    # Half of all follows go to a few popular users (a skewed distribution), the rest uniformly
+    def followee():
+        if rng.random() < 0.5:
+            return int(rng.paretovariate(1.2) - 1) % settings['users']
+        return rng.randrange(settings['users'])
+
+    follows = ((username(i), username(followee())) for i in range(settings['users']) for _ in range(settings['follows_per_user']))
+    for chunk in _chunks(follows):
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO follow_relationships (follower, following) VALUES (?, ?)',
+                             (row for row in chunk if row[0] != row[1]))
+
+    database.rebuild_streaks(conn)
+    scoring.rebuild_all_scores(conn)
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('users', 'income', 'expenses', 'follow_relationships')}
+    conn.close()
+
+    return {'scale': scale, 'seed': seed, **settings, 'rows': counts,
+            'generated_seconds': round(time.perf_counter() - started, 1)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='path of the database to create')
+    args = parser.parse_args()
+
+    summary = generate(args.output, args.scale, args.seed)
+    print(summary)
+
+if __name__ == '__main__':
+    main()
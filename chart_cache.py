@@ -0,0 +1,83 @@
+import hashlib
+import os
+import shutil
+
+# Rendered charts keep the fixed file names the templates link to (images/<username>/<chart>.png).
+# Next to each PNG a small .key file records which (username, chart, period, data fingerprint)
+# produced it, so a repeat view with unchanged data is served from disk without re-rendering.
+
+def fingerprint(rows, fields):
+    # Hash the fields of the rows a chart is drawn from; any added or changed row changes it.
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(tuple(row[field] for field in fields)).encode())
+    return digest.hexdigest()
+
+def cache_key(username, chart, period, data_fingerprint):
+    return f'{username}|{chart}|{period}|{data_fingerprint}'
+
+def _key_path(image_path):
+    return os.path.splitext(image_path)[0] + '.key'
+
+def is_fresh(image_path, key):
+    # True when image_path exists and was rendered for exactly this key.
+    try:
+        with open(_key_path(image_path)) as key_file:
+            cached_key = key_file.read()
+    except OSError:
+        return False
+
+    if cached_key != key or not os.path.exists(image_path):
+        return False
+
+    # Mark the user's folder as recently used for eviction.
+    os.utime(os.path.dirname(image_path))
+    return True
+
+def mark_fresh(image_path, key):
+    # Record that image_path now holds the chart for key.
+    tmp_path = _key_path(image_path) + '.tmp'
+    with open(tmp_path, 'w') as key_file:
+        key_file.write(key)
+    os.replace(tmp_path, _key_path(image_path))
+
+def invalidate(user_folder):
+    # Forget every cached chart for a user (their data changed); the PNGs stay until re-rendered.
+    try:
+        names = os.listdir(user_folder)
+    except FileNotFoundError:
+        return
+
+    for name in names:
+        if name.endswith('.key'):
+            try:
+                os.remove(os.path.join(user_folder, name))
+            except FileNotFoundError:
+                pass
+
+def touch(user_folder):
+    # Mark a user's folder as just used, e.g. when one of their charts is queued for rendering.
+    try:
+        os.utime(user_folder)
+    except FileNotFoundError:
+        pass
+
+def evict_stale(chart_folder, max_users, keep=None):
+    # Keep at most max_users user folders, removing the least recently used ones. The folder
+    # `keep` (one with a render in flight) is never removed, though it counts towards the limit.
+    try:
+        entries = [entry for entry in os.scandir(chart_folder) if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    if keep is not None:
+        keep = os.path.abspath(keep)
+        others = [entry for entry in entries if os.path.abspath(entry.path) != keep]
+        max_users -= len(entries) - len(others)
+        entries = others
+
+    if len(entries) <= max_users:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - max_users]:
+        shutil.rmtree(entry.path, ignore_errors=True)
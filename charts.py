@@ -0,0 +1,111 @@
+import os
+import threading
+
+# Chart renderers. These run inside the render_service worker processes, so they only take
+# plain picklable arguments and write straight to file_path. They use the object-oriented
+# Figure API rather than pyplot, so no global figure state is involved. matplotlib is
+# imported inside the functions that need it, so importing this module (as app.py does)
+# stays cheap and only a process that actually draws a chart pays for loading it.
+
+TEXT_COLOR = '#c0e2df'
+LINE_COLOR = '#39FF14'
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Figure size in inches and output DPI per chart and preset. Sizes match the original layout
+# (fonts are sized for them); the presets only change how many pixels are written.
+PRESETS = {
+    'pie': {
+        'full': {'figsize': (8, 6), 'dpi': 150},
+        'thumbnail': {'figsize': (8, 6), 'dpi': 50},
+    },
+    'polygon': {
+        'full': {'figsize': (21, 14), 'dpi': 75},
+        'thumbnail': {'figsize': (21, 14), 'dpi': 25},
+    },
+}
+
+# Styled text for each chart template
+PIE_LABEL_STYLE = {'fontsize': 17, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': TEXT_COLOR}
+PIE_PERCENT_STYLE = {'fontsize': 15, 'fontfamily': 'serif', 'fontweight': 'normal', 'color': TEXT_COLOR}
+PIE_TITLE_STYLE = {'fontsize': 25, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': TEXT_COLOR}
+POLYGON_TITLE_STYLE = {'fontsize': 50, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': TEXT_COLOR}
+POLYGON_AXIS_LABEL_STYLE = {'fontsize': 40, 'fontfamily': 'serif', 'fontweight': 'bold', 'color': TEXT_COLOR}
+
+# One Figure per (chart, preset) is kept and cleared between renders instead of being rebuilt.
+_figures = {}
+_figures_lock = threading.Lock()
+
+def _figure(chart, preset):
+    # Return the reusable Figure for a chart/preset pair, cleared and ready to draw on.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    key = (chart, preset)
+    with _figures_lock:
+        if key not in _figures:
+            figure = Figure(figsize=PRESETS[chart][preset]['figsize'])
+            FigureCanvasAgg(figure)
+            _figures[key] = (figure, threading.Lock())
+    figure, lock = _figures[key]
+    return figure, lock
+
+def render_pie_chart(file_path, amounts, categories, title, preset='full'):
+    figure, lock = _figure('pie', preset)
+    with lock:
+        figure.clear()
+        ax = figure.add_subplot()
+        ax.set_title(title, **PIE_TITLE_STYLE)
+
+        # Nothing to divide up yet (e.g. the first days of a month): show a note instead of failing
+        if not any(amount > 0 for amount in amounts):
+            ax.axis('off')
+            ax.text(0.5, 0.5, 'No entries yet', ha='center', va='center', transform=ax.transAxes, **PIE_LABEL_STYLE)
+            save_figure(figure, file_path, PRESETS['pie'][preset]['dpi'])
+            return
+
+        _, _, percent_labels = ax.pie(
+            amounts,
+            labels=categories,
+            autopct=lambda p: f'{p:.1f}%',
+            startangle=140,
+            textprops=PIE_LABEL_STYLE,
+            pctdistance=0.85  # Adjusts the position of the percentage text
+        )
+        for text in percent_labels:
+            text.update(PIE_PERCENT_STYLE)
+
+        save_figure(figure, file_path, PRESETS['pie'][preset]['dpi'])
+
+def month_labels(months):
+    # Tick labels for 'YYYY-MM' months: 'Jan'..'Dec' within one year, 'Jan 24' style across years
+    multi_year = len({month[:4] for month in months}) > 1
+    return [MONTH_LABELS[int(month[5:7]) - 1] + (f' {month[2:4]}' if multi_year else '') for month in months]
+
+def render_frequency_polygon(file_path, months, amounts, title, preset='full'):
+    # months are 'YYYY-MM' labels and amounts their totals, as built by series.monthly_series
+    figure, lock = _figure('polygon', preset)
+    with lock:
+        figure.clear()
+        # Fixed margins sized for the fonts below, instead of a tight_layout pass on every render
+        figure.subplots_adjust(left=0.1, right=0.97, top=0.92, bottom=0.14)
+        ax = figure.add_subplot()
+
+        ax.plot(month_labels(months), amounts, marker='o', linestyle='-', color=LINE_COLOR)
+        ax.set_title(title, **POLYGON_TITLE_STYLE)
+        ax.set_xlabel('Month', **POLYGON_AXIS_LABEL_STYLE)
+        ax.set_ylabel('Amount', **POLYGON_AXIS_LABEL_STYLE)
+        ax.tick_params(axis='x', labelsize=30, colors=TEXT_COLOR, labelrotation=45)
+        ax.tick_params(axis='y', labelsize=30, colors=TEXT_COLOR)
+        for spine in ax.spines.values():
+            spine.set_color(TEXT_COLOR)
+        ax.grid(color='gray', linestyle='--', linewidth=0.7)
+
+        save_figure(figure, file_path, PRESETS['polygon'][preset]['dpi'])
+
+def save_figure(figure, file_path, dpi):
+    # Write the figure beside the target and swap it in, so readers never see a partial file.
+    # The format follows the file extension, so a '.svg' path gives a vector image.
+    output_format = os.path.splitext(file_path)[1].lstrip('.').lower() or 'png'
+    tmp_path = file_path + '.tmp'
+    figure.savefig(tmp_path, format=output_format, dpi=dpi, transparent=True)
+    os.replace(tmp_path, file_path)
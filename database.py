@@ -1,7 +1,316 @@
 import sqlite3
 
-def init_db():
-    conn = sqlite3.connect('budgetbadger.db')
+DATABASE = 'budgetbadger.db'
+
+# Allowed categories, enforced by the CHECK constraints below and by the forms and CSV import.
+EXPENSE_CATEGORIES = (
+    'Food & Drinks', 'Shopping', 'Transport', 'Home',
+    'Bills & Fees', 'Entertainment', 'Car', 'Travel',
+    'Family & Personal', 'Healthcare', 'Education',
+    'Groceries', 'Gifts', 'Sports & Hobbies', 'Beauty',
+    'Work', 'Other Expenses'
+)
+INCOME_CATEGORIES = (
+    'Salary', 'Business', 'Gifts', 'Extra Income',
+    'Loan', 'Investments', 'Insurance Payout', 'Other Incomes'
+)
+
+def _sql_list(values):
+    # Render values as a quoted SQL list for a CHECK(... IN (...)) constraint
+    return ', '.join("'" + value.replace("'", "''") + "'" for value in values)
+
+def rollup_triggers(table, kind):
+    # Triggers that keep monthly_rollups in step with every insert, delete and update on `table`.
+    add = f'''
+        INSERT INTO monthly_rollups (username, month, kind, category, total, entry_count, hundreds)
+        VALUES (NEW.username, substr(NEW.date, 1, 7), '{kind}', NEW.category, NEW.amount, 1, CAST(NEW.amount / 100 AS INTEGER))
+        ON CONFLICT (username, kind, month, category) DO UPDATE SET
+            total = total + excluded.total,
+            entry_count = entry_count + 1,
+            hundreds = hundreds + excluded.hundreds;
+    '''
+    remove = f'''
+        UPDATE monthly_rollups
+        SET total = total - OLD.amount,
+            entry_count = entry_count - 1,
+            hundreds = hundreds - CAST(OLD.amount / 100 AS INTEGER)
+        WHERE username = OLD.username AND kind = '{kind}' AND month = substr(OLD.date, 1, 7) AND category = OLD.category;
+        DELETE FROM monthly_rollups
+        WHERE username = OLD.username AND kind = '{kind}' AND month = substr(OLD.date, 1, 7) AND category = OLD.category
+              AND entry_count <= 0;
+    '''
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert AFTER INSERT ON {table} BEGIN {add} END',
+        f'CREATE TRIGGER IF NOT EXISTS {table}_rollup_delete AFTER DELETE ON {table} BEGIN {remove} END',
+        f'''CREATE TRIGGER IF NOT EXISTS {table}_rollup_update
+           AFTER UPDATE OF username, date, amount, category ON {table} BEGIN {remove} {add} END''',
+    ]
+
+def rollup_backfill(table, kind):
+    # Recompute the rollup rows of one table from scratch.
+    return f'''
+        INSERT INTO monthly_rollups (username, month, kind, category, total, entry_count, hundreds)
+        SELECT username, substr(date, 1, 7), '{kind}', category,
+               SUM(amount), COUNT(*), SUM(CAST(amount / 100 AS INTEGER))
+        FROM {table}
+        GROUP BY username, substr(date, 1, 7), category
+    '''
+
+def streak_backfill(where=''):
+    # Recompute user_streaks rows from the distinct active days in both transaction tables, optionally
+    # limited by a WHERE clause on username. Consecutive days share the same date-minus-row-number
+    # value, so each run of days is one group (the usual gaps-and-islands trick).
+    return f'''
+        WITH days AS (
+            SELECT username, date FROM income {where}
+            UNION
+            SELECT username, date FROM expenses {where}
+        ), runs AS (
+            SELECT username, date,
+                   julianday(date) - ROW_NUMBER() OVER (PARTITION BY username ORDER BY date) AS run
+            FROM days
+        ), islands AS (
+            SELECT username, COUNT(*) AS length, MAX(date) AS last_day
+            FROM runs
+            GROUP BY username, run
+        ), ranked AS (
+            SELECT username, length, last_day,
+                   MAX(length) OVER (PARTITION BY username) AS longest,
+                   ROW_NUMBER() OVER (PARTITION BY username ORDER BY last_day DESC) AS recency
+            FROM islands
+        )
+        INSERT INTO user_streaks (username, current_run, last_active, longest_run)
+        SELECT username, length, last_day, longest FROM ranked WHERE recency = 1
+    '''
+
+def follow_counts_backfill():
+    # Recompute every user's follower/following counters from follow_relationships.
+    return '''
+        UPDATE users SET
+            follower_count = (SELECT COUNT(*) FROM follow_relationships WHERE following = users.username),
+            following_count = (SELECT COUNT(*) FROM follow_relationships WHERE follower = users.username)
+    '''
+
+# Schema migrations, applied in order on top of the base tables. PRAGMA user_version records
+# how many have run, so each list of statements executes exactly once per database.
+MIGRATIONS = [
+    # 1: Secondary indexes for per-user history, follower lookups and the leaderboard ranking.
+    # (follower, following) and leaderboard.username are already covered by their UNIQUE constraints.
+    [
+        'CREATE INDEX IF NOT EXISTS idx_expenses_username_date ON expenses (username, date)',
+        'CREATE INDEX IF NOT EXISTS idx_income_username_date ON income (username, date)',
+        'CREATE INDEX IF NOT EXISTS idx_follow_relationships_following ON follow_relationships (following)',
+        'CREATE INDEX IF NOT EXISTS idx_leaderboard_achievement_points ON leaderboard (achievement_points)',
+    ],
+    # 2: Per-user monthly totals by kind ('income' or 'expenses') and category, maintained by triggers.
+    # hundreds is SUM(amount // 100), which is what achievement points are computed from.
+    [
+        '''CREATE TABLE IF NOT EXISTS monthly_rollups (
+            username TEXT NOT NULL,
+            month TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK(kind IN ('income', 'expenses')),
+            category TEXT NOT NULL,
+            total REAL NOT NULL,
+            entry_count INTEGER NOT NULL,
+            hundreds INTEGER NOT NULL,
+            PRIMARY KEY (username, kind, month, category)
+        ) WITHOUT ROWID''',
+        *rollup_triggers('income', 'income'),
+        *rollup_triggers('expenses', 'expenses'),
+        rollup_backfill('income', 'income'),
+        rollup_backfill('expenses', 'expenses'),
+    ],
+    # 3: Per-user activity streaks: the run of consecutive active days ending at last_active, and the
+    # longest run ever. Advanced in O(1) per insert by scoring.record_activity.
+    [
+        '''CREATE TABLE IF NOT EXISTS user_streaks (
+            username TEXT PRIMARY KEY,
+            current_run INTEGER NOT NULL,
+            last_active TEXT NOT NULL,
+            longest_run INTEGER NOT NULL,
+            FOREIGN KEY (username) REFERENCES users(username)
+        )''',
+        streak_backfill(),
+    ],
+    # 4: Denormalised follower/following counters on users, kept current by follow_relationships triggers.
+    [
+        'ALTER TABLE users ADD COLUMN follower_count INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE users ADD COLUMN following_count INTEGER NOT NULL DEFAULT 0',
+        '''CREATE TRIGGER IF NOT EXISTS follow_relationships_count_insert AFTER INSERT ON follow_relationships BEGIN
+            UPDATE users SET follower_count = follower_count + 1 WHERE username = NEW.following;
+            UPDATE users SET following_count = following_count + 1 WHERE username = NEW.follower;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS follow_relationships_count_delete AFTER DELETE ON follow_relationships BEGIN
+            UPDATE users SET follower_count = follower_count - 1 WHERE username = OLD.following;
+            UPDATE users SET following_count = following_count - 1 WHERE username = OLD.follower;
+        END''',
+        follow_counts_backfill(),
+    ],
+    # 5: Case-insensitive username index for prefix search.
+    [
+        'CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE)',
+    ],
+    # 6: Background job queue (see jobs.py). At most one pending job per (kind, username), so repeated
+    # enqueues coalesce; run_after is when a pending job is due or a running job's lease expires.
+    [
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            username TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'running', 'failed')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            last_error TEXT
+        )''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (kind, username) WHERE status = 'pending'",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (run_after) WHERE status IN ('pending', 'running')",
+    ],
+    # 7: Versions of the in-process read caches, shared by every process using the database. Writers
+    # move a version on in the same transaction as the change that makes the cached reads stale.
+    [
+        '''CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID''',
+        "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('leaderboard', 0)",
+    ],
+]
+
+# Optional trigram index for substring ("fuzzy") username search. It needs SQLite built with FTS5
+# (trigram tokenizer: 3.34+), so it is not a migration; create_user_search_index builds it on demand.
+USER_SEARCH_INDEX = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS users_search
+       USING fts5(username, content='users', content_rowid='id', tokenize='trigram')''',
+    '''CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_search (rowid, username) VALUES (NEW.id, NEW.username);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_search (users_search, rowid, username) VALUES ('delete', OLD.id, OLD.username);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE OF username ON users BEGIN
+        INSERT INTO users_search (users_search, rowid, username) VALUES ('delete', OLD.id, OLD.username);
+        INSERT INTO users_search (rowid, username) VALUES (NEW.id, NEW.username);
+    END''',
+    "INSERT INTO users_search (users_search) VALUES ('rebuild')",
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def connect(path=DATABASE, factory=sqlite3.Connection):
+    # Open a connection tuned for many concurrent readers and short writes. WAL lets readers
+    # keep going while a form submission commits, and synchronous=NORMAL is durable enough in WAL mode.
+    # factory is the Connection class to use (e.g. instrumentation.ProfiledConnection).
+    conn = sqlite3.connect(path, timeout=30, factory=factory)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -16000')  # About 16 MB of page cache
+    conn.execute('PRAGMA mmap_size = 134217728')  # Memory-map up to 128 MB of the file
+    return conn
+
+def init_db(path=DATABASE):
+    # Create and migrate the schema. A database already at SCHEMA_VERSION needs neither, so the
+    # common case (every worker start) is a single PRAGMA read.
+    conn = connect(path)
+    if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        create_tables(conn)
+        migrate(conn)
+    conn.close()
+
+def migrate(conn):
+    # Bring the schema up to SCHEMA_VERSION, one migration per transaction. Every worker process
+    # migrates on its first connection, so each step takes the write lock (BEGIN IMMEDIATE) and
+    # re-reads the version under it, skipping a migration another process has just applied.
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= target:
+                conn.rollback()
+                continue
+            for statement in MIGRATIONS[target - 1]:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+def rebuild_rollups(conn):
+    # Discard and recompute monthly_rollups from the transaction tables.
+    conn.execute('BEGIN')
+    try:
+        conn.execute('DELETE FROM monthly_rollups')
+        conn.execute(rollup_backfill('income', 'income'))
+        conn.execute(rollup_backfill('expenses', 'expenses'))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def cache_version(conn, name):
+    # Current shared version of the read cache `name` (see read_cache.TTLCache.get_or_load).
+    row = conn.execute('SELECT version FROM cache_versions WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else 0
+
+def bump_cache_version(conn, name):
+    # Invalidate the read cache `name` in every process. Does not commit: call it in the
+    # transaction making the change, so no process can cache the old data under the new version.
+    conn.execute('UPDATE cache_versions SET version = version + 1 WHERE name = ?', (name,))
+
+def replace_streaks(conn, username=None):
+    # Recompute user_streaks for one user, or for everyone, inside the caller's transaction.
+    if username is None:
+        conn.execute('DELETE FROM user_streaks')
+        conn.execute(streak_backfill())
+    else:
+        conn.execute('DELETE FROM user_streaks WHERE username = :username', {'username': username})
+        conn.execute(streak_backfill('WHERE username = :username'), {'username': username})
+
+def rebuild_streaks(conn, username=None):
+    # Recompute user_streaks for one user, or for everyone, from their transaction dates.
+    conn.execute('BEGIN')
+    try:
+        replace_streaks(conn, username)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def repair_follow_counts(conn):
+    # Rewrite follower/following counters that have drifted from follow_relationships.
+    # Returns how many users were corrected.
+    conn.execute('BEGIN')
+    try:
+        drifted = conn.execute('''
+            SELECT COUNT(*) FROM users
+            WHERE follower_count != (SELECT COUNT(*) FROM follow_relationships WHERE following = users.username)
+               OR following_count != (SELECT COUNT(*) FROM follow_relationships WHERE follower = users.username)
+        ''').fetchone()[0]
+        if drifted:
+            conn.execute(follow_counts_backfill())
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return drifted
+
+def create_user_search_index(conn):
+    # Build (or rebuild) the trigram username index. Returns False if this SQLite lacks FTS5 trigrams.
+    conn.execute('BEGIN')
+    try:
+        for statement in USER_SEARCH_INDEX:
+            conn.execute(statement)
+        conn.commit()
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return False
+    return True
+
+def has_user_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_search'").fetchone() is not None
+
+def create_tables(conn):
     cursor = conn.cursor()
 
 # Create the 'users' table if it doesn't exist already.
@@ -17,35 +326,26 @@ def init_db():
     ''')
 
 # Create the 'expenses' table if it doesn't exist already.
-    cursor.execute('''
+    cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS expenses (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT NOT NULL,
         date TEXT NOT NULL,
         amount REAL CHECK(amount >= 0.01) NOT NULL,
-        category TEXT CHECK(category IN (
-            'Food & Drinks', 'Shopping', 'Transport', 'Home', 
-            'Bills & Fees', 'Entertainment', 'Car', 'Travel', 
-            'Family & Personal', 'Healthcare', 'Education', 
-            'Groceries', 'Gifts', 'Sports & Hobbies', 'Beauty', 
-            'Work', 'Other Expenses'
-        )) NOT NULL,
+        category TEXT CHECK(category IN ({_sql_list(EXPENSE_CATEGORIES)})) NOT NULL,
         description TEXT,
         FOREIGN KEY (username) REFERENCES users(username)
     )
     ''')
 
 # Create the 'income' table if it doesn't exist already.
-    cursor.execute('''
+    cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS income (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT NOT NULL,
         date TEXT NOT NULL,
         amount REAL CHECK(amount >= 0.01) NOT NULL,
-        category TEXT CHECK(category IN (
-            'Salary', 'Business', 'Gifts', 'Extra Income', 
-            'Loan', 'Investments', 'Insurance Payout', 'Other Incomes'
-        )) NOT NULL,
+        category TEXT CHECK(category IN ({_sql_list(INCOME_CATEGORIES)})) NOT NULL,
         description TEXT,
         FOREIGN KEY (username) REFERENCES users(username)
     )
@@ -88,4 +388,3 @@ def init_db():
     ''')
 
     conn.commit()
-    conn.close()
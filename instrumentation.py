@@ -0,0 +1,183 @@
+import functools
+import json
+import logging
+import sqlite3
+import time
+
+from flask import g, request, before_render_template, template_rendered
+
+# Per-request timing. While a request runs, g.profile collects every SQL statement run on the
+# request's connection (text, count, duration) and named spans such as chart rendering, scoring
+# and template rendering. When the response goes out the totals are added as a Server-Timing
+# header (visible in the browser's network panel) and written as one JSON line to the
+# 'instrumentation' logger. Statements slower than SLOW_QUERY_MS are logged at WARNING with their
+# EXPLAIN QUERY PLAN. init_app registers all of this on a Flask app.
+
+logger = logging.getLogger(__name__)
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # [sql, params, duration in seconds, executemany?]
+        self.spans = {}  # name -> [count, total seconds]
+
+    def add_span(self, name, seconds):
+        span = self.spans.setdefault(name, [0, 0.0])
+        span[0] += 1
+        span[1] += seconds
+
+    def db_seconds(self):
+        return sum(query[2] for query in self.queries)
+
+def current_profile():
+    # The running request's profile, or None outside a profiled request (CLI commands, workers).
+    return g.get('profile') if g else None
+
+def timed(name):
+    # Decorator recording each call of the function as a `name` span of the current request.
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = current_profile()
+            if profile is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.add_span(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+class ProfiledCursor(sqlite3.Cursor):
+    # Times execute calls and the fetches that follow them, charging both to the statement.
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters, True)
+
+    def _timed(self, run, sql, parameters, many):
+        profile = getattr(self.connection, 'profile', None)
+        if profile is None:
+            self._query = None
+            return run(sql, parameters)
+
+        self._query = [sql, None if many else parameters, 0.0, many]
+        profile.queries.append(self._query)
+        start = time.perf_counter()
+        try:
+            return run(sql, parameters)
+        finally:
+            self._query[2] += time.perf_counter() - start
+
+    def _fetch(self, fetch, *args):
+        if self._query is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._query[2] += time.perf_counter() - start
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def __next__(self):
+        return self._fetch(super().__next__)
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection whose statements are recorded in `profile` (a RequestProfile, or None to skip).
+    # The C implementation of Connection.execute bypasses Python cursor subclasses, so the
+    # shortcut methods are routed through ProfiledCursor explicitly.
+    profile = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def server_timing(profile, total_seconds):
+    # Server-Timing header value: total, db (with the statement count) and each span, in ms.
+    metrics = [f'total;dur={total_seconds * 1000:.1f}',
+               f'db;dur={profile.db_seconds() * 1000:.1f};desc="{len(profile.queries)} queries"']
+    for name, (count, seconds) in profile.spans.items():
+        metrics.append(f'{name};dur={seconds * 1000:.1f};desc="{count} calls"')
+    return ', '.join(metrics)
+
+def log_slow_queries(conn, profile, threshold_ms):
+    # Log each statement slower than threshold_ms, with its query plan (not for executemany).
+    for sql, parameters, seconds, many in profile.queries:
+        if seconds * 1000 < threshold_ms:
+            continue
+        plan = []
+        if not many and sql.lstrip().upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            try:
+                plan = [row[3] for row in sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters)]
+            except sqlite3.Error:
+                pass
+        logger.warning('slow query %s', json.dumps({
+            'path': request.path,
+            'duration_ms': round(seconds * 1000, 2),
+            'sql': ' '.join(sql.split()),
+            'plan': plan,
+        }))
+
+def init_app(app, get_connection):
+    # Register the profiling hooks on app. get_connection returns the request's (Profiled)
+    # connection; it is only used to explain slow queries.
+    @app.before_request
+    def start_profile():
+        if app.config['REQUEST_TIMING']:
+            g.profile = RequestProfile()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+
+        total = time.perf_counter() - profile.started
+        response.headers['Server-Timing'] = server_timing(profile, total)
+
+        if app.config['SLOW_QUERY_MS'] is not None and 'db' in g:
+            log_slow_queries(get_connection(), profile, app.config['SLOW_QUERY_MS'])
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(profile.db_seconds() * 1000, 2),
+            'queries': len(profile.queries),
+            'spans': {name: {'calls': count, 'ms': round(seconds * 1000, 2)}
+                      for name, (count, seconds) in profile.spans.items()},
+        }))
+        return response
+
+    def start_template(sender, template, context, **extra):
+        if current_profile() is not None:
+            g.template_started = time.perf_counter()
+
+    def finish_template(sender, template, context, **extra):
+        profile = current_profile()
+        started = g.pop('template_started', None)
+        if profile is not None and started is not None:
+            profile.add_span('template', time.perf_counter() - started)
+
+    # Strong references, since these local functions would otherwise be garbage collected
+    before_render_template.connect(start_template, app, weak=False)
+    template_rendered.connect(finish_template, app, weak=False)
@@ -0,0 +1,75 @@
+import sqlite3
+import time
+
+# Durable background jobs in the `jobs` table. Writers enqueue in the same transaction as the
+# data change, so a job exists exactly when its change was committed. Only one pending job per
+# (kind, username) can exist, so a burst of writes by one user leaves a single job to run. A worker
+# claims the oldest due job under a lease: if the worker dies, the job becomes claimable again once
+# the lease runs out. Failed jobs are retried with exponential backoff, then parked as 'failed'.
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5  # Wait before the first retry; doubles with each further attempt
+LEASE_SECONDS = 300  # How long a claimed job is reserved for its worker
+
+def enqueue(conn, kind, username, delay=0):
+    # Add a pending job unless an identical one is already waiting. Does not commit: call it
+    # inside the transaction that made the change the job follows up on.
+    conn.execute('''INSERT INTO jobs (kind, username, run_after) VALUES (?, ?, ?)
+                    ON CONFLICT (kind, username) WHERE status = 'pending' DO NOTHING''',
+                 (kind, username, time.time() + delay))
+
+def claim(conn):
+    # Reserve the oldest due job (a pending one, or a running one whose lease expired).
+    # Returns (id, kind, username, attempts) with attempts counting this run, or None if nothing is due.
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        job = conn.execute('''SELECT id, kind, username, attempts FROM jobs
+                              WHERE status IN ('pending', 'running') AND run_after <= ?
+                              ORDER BY run_after, id
+                              LIMIT 1''', (now,)).fetchone()
+        if job is not None:
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ? WHERE id = ?",
+                         (now + LEASE_SECONDS, job[0]))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    if job is None:
+        return None
+    return job[0], job[1], job[2], job[3] + 1
+
+def complete(conn, job_id):
+    conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+    conn.commit()
+
+def fail(conn, job_id, attempts, error):
+    # Schedule a retry after RETRY_BASE_SECONDS * 2^(attempts - 1), or park the job as 'failed'
+    # after MAX_ATTEMPTS. A retry that collides with a newer pending job for the same user is
+    # dropped, since that job will redo the same work anyway.
+    try:
+        if attempts >= MAX_ATTEMPTS:
+            conn.execute("UPDATE jobs SET status = 'failed', last_error = ? WHERE id = ?", (error, job_id))
+        else:
+            conn.execute("UPDATE jobs SET status = 'pending', run_after = ?, last_error = ? WHERE id = ?",
+                         (time.time() + RETRY_BASE_SECONDS * 2 ** (attempts - 1), error, job_id))
+    except sqlite3.IntegrityError:
+        conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+    conn.commit()
+
+def run_next(conn, handlers):
+    # Claim one due job and run handlers[kind](username). Returns False when no job was due.
+    job = claim(conn)
+    if job is None:
+        return False
+
+    job_id, kind, username, attempts = job
+    try:
+        handlers[kind](username)
+    except Exception as e:
+        conn.rollback()  # Drop whatever the failed handler left uncommitted
+        fail(conn, job_id, attempts, f'{type(e).__name__}: {e}')
+    else:
+        complete(conn, job_id)
+    return True
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Small in-process cache for hot read queries. Entries expire after `ttl` seconds and the least
+# recently used ones are dropped past `maxsize`. Every entry also records the cache's version at
+# the time it was stored; bump() moves the version on, so all older entries miss without having
+# to find and delete them. The cache lives in one process; to see writes made by other processes,
+# pass get_or_load a version kept in the database (database.cache_version), which takes the place
+# of bump() for that cache.
+
+MISSING = object()
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._entries = OrderedDict()  # key -> (version, expires_at, value), oldest use first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # Cached value for key, or MISSING when absent, expired or from an older version.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+
+            version, expires_at, value = entry
+            if version != self.version or expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version=None):
+        # Store value for key. Passing the version read before loading the value skips the store
+        # when a bump() happened in between, so a load that raced an invalidation is not cached.
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (self.version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, load, version=None):
+        # Return the cached value for key, calling load() and caching its result on a miss.
+        # version is the current shared version, read just before; when it differs from the
+        # cache's, every entry is dropped first, as by bump().
+        if version is not None:
+            self.sync(version)
+        value = self.get(key)
+        if value is MISSING:
+            version = self.version
+            value = load()
+            self.set(key, value, version)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def sync(self, version):
+        # Adopt a version kept outside this process, invalidating every entry if it moved.
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def bump(self):
+        # Invalidate every current entry at once.
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
@@ -0,0 +1,67 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import chart_cache
+
+# Renders charts in a pool of worker processes so page views never wait on matplotlib (whose
+# pyplot state is not thread-safe anyway). Requests for a chart already being drawn from the
+# same data share the in-flight job instead of queueing another one.
+
+logger = logging.getLogger(__name__)
+
+_max_workers = 2
+_executor = None
+_pending = {}  # cache key -> (file path, future)
+_lock = threading.Lock()
+
+def configure(max_workers):
+    # Set the pool size; 0 renders inline in the calling thread (useful for scripts and benchmarks).
+    global _max_workers
+    _max_workers = max_workers
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # 'spawn' keeps workers independent of the web server's threads and open connections.
+        _executor = ProcessPoolExecutor(max_workers=_max_workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+def _render_and_mark(render, file_path, key, args):
+    # Runs in the worker: draw the chart, then record which data it was drawn from.
+    render(file_path, *args)
+    chart_cache.mark_fresh(file_path, key)
+
+def _finished(key, future):
+    with _lock:
+        _pending.pop(key, None)
+    if future.exception() is not None:
+        logger.error('Chart render failed for %s', key, exc_info=future.exception())
+
+def submit(key, file_path, render, *args):
+    # Queue render(file_path, *args) unless an identical render is already in flight.
+    if _max_workers == 0:
+        _render_and_mark(render, file_path, key, args)
+        return
+
+    global _executor
+    with _lock:
+        if key in _pending:
+            return
+        try:
+            future = _get_executor().submit(_render_and_mark, render, file_path, key, args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool and try once more.
+            _executor = None
+            future = _get_executor().submit(_render_and_mark, render, file_path, key, args)
+        _pending[key] = (file_path, future)
+
+    future.add_done_callback(lambda done: _finished(key, done))
+
+def is_pending(file_path):
+    # True while any render targeting file_path is still running.
+    with _lock:
+        return any(path == file_path for path, _ in _pending.values())
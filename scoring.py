@@ -0,0 +1,249 @@
+from bisect import bisect_right
+from datetime import date
+import database
+
+# numpy and pandas are only needed by the batch rescoring below, so they are imported there rather
+# than here; the per-user paths that run on every request load neither.
+
+# Points per whole 100 of income, by category. Categories not listed (e.g. 'Investments') earn nothing.
+INCOME_POINT_RATES = {
+    'Salary': 10,
+    'Business': 15,
+    'Gifts': 5,
+    'Extra Income': 7,
+    'Loan': 3,
+    'Insurance Payout': 8,
+    'Other Incomes': 6,
+}
+
+ESSENTIAL_EXPENSE_CATEGORIES = {'Groceries', 'Healthcare', 'Education', 'Food & Drinks', 'Transport'}
+
+# Lower bounds for badges 3..7; any positive value below the first bound gets badge 2, zero or less badge 1.
+AP_BADGE_THRESHOLDS = (2500, 5000, 10000, 25000, 50000)
+INCOME_BADGE_THRESHOLDS = (100, 2000, 5000, 10000, 20000)
+EXPENSE_BADGE_THRESHOLDS = (1000, 2000, 5000, 10000, 20000)
+
+# Lifetime per-category aggregates for one user, summed from the monthly_rollups rows the
+# transaction triggers maintain. hundreds is SUM(amount // 100) over the underlying rows.
+USER_ROLLUP_QUERY = '''
+    SELECT kind, category,
+           SUM(hundreds) AS hundreds,
+           SUM(total) AS total,
+           SUM(entry_count) AS entries
+    FROM monthly_rollups
+    WHERE username = ?
+    GROUP BY kind, category
+'''
+
+def fetch_user_aggregates(conn, username):
+    # Split the user's rollup aggregates into income and expense (category, hundreds, total, entries) rows.
+    rows = conn.execute(USER_ROLLUP_QUERY, (username,)).fetchall()
+    incomes = [tuple(row[1:]) for row in rows if row[0] == 'income']
+    expenses = [tuple(row[1:]) for row in rows if row[0] == 'expenses']
+    return incomes, expenses
+
+def fetch_longest_run(conn, username):
+    row = conn.execute('SELECT longest_run FROM user_streaks WHERE username = ?', (username,)).fetchone()
+    return row[0] if row else 0
+
+def record_activity(conn, username, day):
+    # Advance the user's streak for a transaction dated `day` ('YYYY-MM-DD') in O(1). A day before
+    # the current run's last day can split or join older runs, so that case falls back to a rebuild.
+    # Does not commit: call it in the transaction that inserts the row, so anything reading the
+    # committed row (such as a queued rescoring job) also sees the streak it produced.
+    row = conn.execute('SELECT current_run, last_active, longest_run FROM user_streaks WHERE username = ?',
+                       (username,)).fetchone()
+    if row is None:
+        conn.execute('INSERT INTO user_streaks (username, current_run, last_active, longest_run) VALUES (?, 1, ?, 1)',
+                     (username, day))
+        return
+
+    current_run, last_active, longest_run = row
+    if day == last_active:
+        return
+    if day < last_active:
+        database.replace_streaks(conn, username)
+        return
+
+    gap = (date.fromisoformat(day) - date.fromisoformat(last_active)).days
+    current_run = current_run + 1 if gap == 1 else 1
+    conn.execute('UPDATE user_streaks SET current_run = ?, last_active = ?, longest_run = ? WHERE username = ?',
+                 (current_run, day, max(longest_run, current_run), username))
+
+def income_points_from_aggregates(incomes):
+    # Same rule as calculate_income_points, applied to per-category sums of amount // 100.
+    return sum(row[1] * INCOME_POINT_RATES.get(row[0], 0) for row in incomes)
+
+def expense_points_from_aggregates(expenses):
+    # Same rule as calculate_expense_points, including the penalty for non-essential spending over 1000.
+    expense_points = 0
+    non_essential_points = 0
+    total_non_essential_spending = 0
+
+    for category, hundreds, total, _ in expenses:
+        if category in ESSENTIAL_EXPENSE_CATEGORIES:
+            expense_points += hundreds * 5
+        else:
+            non_essential_points += hundreds * 2
+            total_non_essential_spending += total
+
+    if total_non_essential_spending > 1000:
+        excess_amount = total_non_essential_spending - 1000
+        non_essential_points -= (excess_amount // 100) * 5
+
+    return expense_points + non_essential_points
+
+def balance_bonus(total_income, total_expense, income_entries, expense_entries):
+    # Same rule as calculate_balanced_activity_bonus: no bonus at all without expenses.
+    if total_expense == 0:
+        return 0
+
+    bonus = 0
+    income_expense_ratio = total_income / total_expense
+    if income_expense_ratio > 1:
+        percentage_extra_income = (income_expense_ratio - 1) * 100
+        bonus = (percentage_extra_income // 10) * 20
+
+    # Consistency bonus based on the number of entries
+    if income_entries >= 5 and expense_entries >= 5:
+        bonus += 30
+
+    return bonus
+
+def daily_streak_points(longest_run):
+    # 10 points once the user has ever logged activity on 7 consecutive days
+    return 10 if longest_run >= 7 else 0
+
+def score_user(conn, username):
+    # Compute achievement points and totals for one user from their rollups and streak state.
+    # Returns (achievement_points, total_income, total_expense).
+    incomes, expenses = fetch_user_aggregates(conn, username)
+
+    total_income = sum(row[2] for row in incomes)
+    total_expense = sum(row[2] for row in expenses)
+    income_entries = sum(row[3] for row in incomes)
+    expense_entries = sum(row[3] for row in expenses)
+
+    achievement_points = (
+        income_points_from_aggregates(incomes) +
+        expense_points_from_aggregates(expenses) +
+        balance_bonus(total_income, total_expense, income_entries, expense_entries) +
+        daily_streak_points(fetch_longest_run(conn, username))
+    )
+
+    return achievement_points, total_income, total_expense
+
+def badge_id(value, thresholds):
+    # Map a total onto a badge ID using one of the *_BADGE_THRESHOLDS tuples.
+    if value is None or value <= 0:
+        return 1
+    return 2 + bisect_right(thresholds, value)
+
+def badge_ids(values, thresholds):
+    # Vectorised badge_id for a whole column of totals.
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    return np.where(values > 0, 2 + np.searchsorted(thresholds, values, side='right'), 1)
+
+# Per-user, per-category aggregates for everyone in one scan of each table.
+ALL_INCOME_AGGREGATE_QUERY = '''
+    SELECT username, category,
+           SUM(CAST(amount / 100 AS INTEGER)) AS hundreds,
+           SUM(amount) AS total,
+           COUNT(*) AS entries
+    FROM income
+    GROUP BY username, category
+'''
+
+ALL_EXPENSE_AGGREGATE_QUERY = '''
+    SELECT username, category,
+           SUM(CAST(amount / 100 AS INTEGER)) AS hundreds,
+           SUM(amount) AS total,
+           COUNT(*) AS entries
+    FROM expenses
+    GROUP BY username, category
+'''
+
+ALL_LONGEST_RUNS_QUERY = 'SELECT username, longest_run FROM user_streaks'
+
+def score_all_users(conn):
+    # Score every user at once with column operations; returns a DataFrame indexed by username with
+    # achievement_points, total_income, total_expense and the three badge IDs. Streaks come from
+    # user_streaks, so rebuild it first (database.rebuild_streaks) if it may be out of date.
+    import numpy as np
+    import pandas as pd
+
+    users = pd.read_sql_query('SELECT username FROM users', conn).set_index('username')
+    incomes = pd.read_sql_query(ALL_INCOME_AGGREGATE_QUERY, conn)
+    expenses = pd.read_sql_query(ALL_EXPENSE_AGGREGATE_QUERY, conn)
+    longest_runs = pd.read_sql_query(ALL_LONGEST_RUNS_QUERY, conn).set_index('username')['longest_run']
+
+    # Income points: per-category hundreds times the category rate.
+    incomes['points'] = incomes['hundreds'] * incomes['category'].map(INCOME_POINT_RATES).fillna(0)
+    income_by_user = incomes.groupby('username').agg(
+        income_points=('points', 'sum'), total_income=('total', 'sum'), income_entries=('entries', 'sum'))
+
+    # Expense points: essentials earn 5 per hundred, everything else 2, minus the over-1000 penalty.
+    essential = expenses['category'].isin(ESSENTIAL_EXPENSE_CATEGORIES)
+    expenses['points'] = expenses['hundreds'] * np.where(essential, 5, 2)
+    expenses['non_essential'] = expenses['total'].where(~essential, 0)
+    expense_by_user = expenses.groupby('username').agg(
+        expense_points=('points', 'sum'), non_essential=('non_essential', 'sum'),
+        total_expense=('total', 'sum'), expense_entries=('entries', 'sum'))
+    excess = expense_by_user['non_essential'] - 1000
+    expense_by_user['expense_points'] -= np.where(excess > 0, np.floor_divide(excess, 100) * 5, 0)
+
+    scores = users.join(income_by_user).join(expense_by_user).fillna(0)
+    scores['longest_run'] = longest_runs.reindex(scores.index).fillna(0)
+
+    # Balance bonus (with the consistency bonus folded in), only for users with expenses.
+    has_expenses = scores['total_expense'] != 0
+    ratio = scores['total_income'] / scores['total_expense'].where(has_expenses, 1)
+    balance = np.where(has_expenses & (ratio > 1), np.floor_divide((ratio - 1) * 100, 10) * 20, 0)
+    consistent = has_expenses & (scores['income_entries'] >= 5) & (scores['expense_entries'] >= 5)
+    balance = balance + np.where(consistent, 30, 0)
+
+    streak = np.where(scores['longest_run'] >= 7, 10, 0)  # Same rule as daily_streak_points
+
+    scores['achievement_points'] = scores['income_points'] + scores['expense_points'] + balance + streak
+    scores['apbadgeid'] = badge_ids(scores['achievement_points'], AP_BADGE_THRESHOLDS)
+    scores['incomebadgeid'] = badge_ids(scores['total_income'], INCOME_BADGE_THRESHOLDS)
+    scores['expensebadgeid'] = badge_ids(scores['total_expense'], EXPENSE_BADGE_THRESHOLDS)
+    return scores
+
+def rebuild_all_scores(conn):
+    # Rescore every user and write leaderboard and badge rows back with one executemany each.
+    scores = score_all_users(conn)
+    usernames = scores.index.tolist()
+
+    leaderboard_rows = list(zip(
+        usernames,
+        scores['achievement_points'].astype('int64').tolist(),
+        scores['total_income'].tolist(),
+        scores['total_expense'].tolist(),
+    ))
+    badge_rows = list(zip(
+        usernames,
+        scores['apbadgeid'].tolist(),
+        scores['incomebadgeid'].tolist(),
+        scores['expensebadgeid'].tolist(),
+    ))
+
+    conn.executemany('''INSERT INTO leaderboard (username, achievement_points, total_income, total_expense)
+                          VALUES (?, ?, ?, ?)
+                          ON CONFLICT(username)
+                          DO UPDATE SET
+                              achievement_points = excluded.achievement_points,
+                              total_income = excluded.total_income,
+                              total_expense = excluded.total_expense''', leaderboard_rows)
+    conn.executemany('''INSERT INTO user_badges (username, apbadgeid, incomebadgeid, expensebadgeid)
+                          VALUES (?, ?, ?, ?)
+                          ON CONFLICT(username)
+                          DO UPDATE SET
+                              apbadgeid = excluded.apbadgeid,
+                              incomebadgeid = excluded.incomebadgeid,
+                              expensebadgeid = excluded.expensebadgeid''', badge_rows)
+    database.bump_cache_version(conn, 'leaderboard')
+    conn.commit()
+    return len(usernames)
@@ -0,0 +1,26 @@
+# Monthly series for the frequency polygons and the chart-data API. Dates are parsed once into
+# numpy datetime64[M] month indexes and the amounts are summed per month with a single weighted
+# np.bincount, so any year or multi-year span works the same way and months without entries
+# come out as 0. numpy is imported on first use to keep app start-up light.
+
+def month_range(first_month, last_month):
+    # 'YYYY-MM' labels from first_month to last_month inclusive
+    import numpy as np
+
+    return np.arange(np.datetime64(first_month, 'M'), np.datetime64(last_month, 'M') + 1).astype(str).tolist()
+
+def monthly_series(dates, amounts, first_month, last_month):
+    # Total amounts per calendar month from first_month to last_month ('YYYY-MM', inclusive).
+    # dates are 'YYYY-MM-DD' or 'YYYY-MM' strings; entries outside the span are ignored.
+    # Returns (month labels, totals) as two equal-length lists.
+    import numpy as np
+
+    first = np.datetime64(first_month, 'M')
+    months = int((np.datetime64(last_month, 'M') - first).astype(np.int64)) + 1
+
+    offsets = (np.asarray(dates, dtype='datetime64[D]').astype('datetime64[M]') - first).astype(np.int64)
+    weights = np.asarray(amounts, dtype=np.float64)
+    inside = (offsets >= 0) & (offsets < months)
+
+    totals = np.bincount(offsets[inside], weights=weights[inside], minlength=months)
+    return month_range(first_month, last_month), totals.astype(np.float64).tolist()
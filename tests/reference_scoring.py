@@ -0,0 +1,181 @@
+# The original per-user achievement point rules, kept as the reference that scoring.py must
+# match (see test_scoring_parity.py). Each function reads the user's full history through the
+# app's request connection, so call them inside an app context.
+
+from datetime import datetime, timedelta
+
+from app import get_db_connection
+
+def fetch_incomes_from_db(username):
+    # Fetch all income records for a specific user
+    conn = get_db_connection()
+    incomes = conn.execute('SELECT * FROM income WHERE username = ?', (username,)).fetchall()
+    return incomes
+
+def fetch_expenses_from_db(username):
+    # Fetch all expense records for a specific user
+    conn = get_db_connection()
+    expenses = conn.execute('SELECT * FROM expenses WHERE username = ?', (username,)).fetchall()
+    return expenses
+
+def fetch_entries(username):
+    # Establish a database connection
+    conn = get_db_connection()
+
+    # SQL query to fetch all dates from income and expenses for the user
+    query = '''
+        SELECT date FROM income WHERE username = ?
+        UNION ALL
+        SELECT date FROM expenses WHERE username = ?
+    '''
+    # Execute the query and fetch all results
+    entries = conn.execute(query, (username, username)).fetchall()
+
+    # Return a list of dates from the entries
+    return [entry['date'] for entry in entries]
+
+def fetch_monthly_entries(username):
+    # Establish a database connection
+    conn = get_db_connection()
+
+    # SQL query to count income entries grouped by month
+    income_entries_query = '''
+        SELECT strftime('%Y-%m', date) AS month, COUNT(*) AS count
+        FROM income
+        WHERE username = ?
+        GROUP BY month
+    '''
+    income_entries = conn.execute(income_entries_query, (username,)).fetchall()
+
+    # SQL query to count expense entries grouped by month
+    expense_entries_query = '''
+        SELECT strftime('%Y-%m', date) AS month, COUNT(*) AS count
+        FROM expenses
+        WHERE username = ?
+        GROUP BY month
+    '''
+    expense_entries = conn.execute(expense_entries_query, (username,)).fetchall()
+
+    # Create dictionaries for monthly income and expense counts
+    monthly_income_entries = {entry['month']: entry['count'] for entry in income_entries}
+    monthly_expense_entries = {entry['month']: entry['count'] for entry in expense_entries}
+
+    # Return the total counts of income and expenses
+    return {
+        'income': sum(monthly_income_entries.values()),
+        'expense': sum(monthly_expense_entries.values())
+    }
+
+def calculate_income_points(username):
+    # Fetch incomes for the specified user
+    incomes = fetch_incomes_from_db(username)
+    income_points = 0
+
+    # Calculate points based on income categories
+    for income in incomes:
+        amount = income['amount']
+        category = income['category']
+
+        # Assign points based on the category of income
+        if category == 'Salary':
+            income_points += (amount // 100) * 10
+        elif category == 'Business':
+            income_points += (amount // 100) * 15
+        elif category == 'Gifts':
+            income_points += (amount // 100) * 5
+        elif category == 'Extra Income':
+            income_points += (amount // 100) * 7
+        elif category == 'Loan':
+            income_points += (amount // 100) * 3
+        elif category == 'Insurance Payout':
+            income_points += (amount // 100) * 8
+        elif category == 'Other Incomes':
+            income_points += (amount // 100) * 6
+
+    return income_points  # Return the total income points
+
+def calculate_expense_points(username):
+    # Fetch expenses for the specified user
+    expenses = fetch_expenses_from_db(username)
+    essential_expenses_categories = {'Groceries', 'Healthcare', 'Education', 'Food & Drinks', 'Transport'}
+    expense_points = 0
+    non_essential_points = 0
+    total_non_essential_spending = 0
+
+    # Calculate points based on expense categories
+    for expense in expenses:
+        amount = expense['amount']
+        category = expense['category']
+
+        if category in essential_expenses_categories:
+            expense_points += (amount // 100) * 5  # Points for essential expenses
+        else:
+            non_essential_points += (amount // 100) * 2  # Points for non-essential expenses
+            total_non_essential_spending += amount
+
+    # Apply penalty for excessive non-essential spending over $1000
+    if total_non_essential_spending > 1000:
+        excess_amount = total_non_essential_spending - 1000
+        penalty_points = (excess_amount // 100) * 5
+        non_essential_points -= penalty_points
+
+    return expense_points + non_essential_points  # Return total expense points
+
+def calculate_balanced_activity_bonus(username):
+    # Fetch incomes and expenses for the specified user
+    incomes = fetch_incomes_from_db(username)
+    expenses = fetch_expenses_from_db(username)
+
+    # Calculate total income and expenses
+    total_income = sum(income['amount'] for income in incomes)
+    total_expense = sum(expense['amount'] for expense in expenses)
+
+    balance_bonus = 0
+
+    # Return 0 if there are no expenses
+    if total_expense == 0:
+        return balance_bonus
+
+    # Calculate income-to-expense ratio and determine balance bonus
+    income_expense_ratio = total_income / total_expense
+    if income_expense_ratio > 1:
+        percentage_extra_income = (income_expense_ratio - 1) * 100
+        balance_bonus = (percentage_extra_income // 10) * 20
+
+    # Fetch monthly entries for consistency bonus
+    monthly_entries = fetch_monthly_entries(username)
+    income_entries = monthly_entries['income']
+    expense_entries = monthly_entries['expense']
+
+    # Consistency bonus based on the number of entries
+    consistency_bonus = 30 if income_entries >= 5 and expense_entries >= 5 else 0
+
+    return balance_bonus + consistency_bonus  # Return total bonus points
+
+def has_seven_day_streak(dates):
+    date_format = "%Y-%m-%d"
+    dates = [datetime.strptime(date, date_format) for date in dates]  # Convert date strings to datetime objects
+    dates = sorted(set(dates))  # Remove duplicates and sort the dates
+
+    # Check if there are at least 7 unique dates
+    if len(dates) < 7:
+        return False
+
+    # Check for a 7-day streak
+    for i in range(len(dates) - 6):
+        streak_dates = dates[i:i+7]
+        if streak_dates[-1] - streak_dates[0] == timedelta(days=6):
+            return True  # Return True if a streak is found
+
+    return False  # Return False if no streak is found
+
+def calculate_daily_streak(username):
+    # Fetch entries for the specified user
+    entries = fetch_entries(username)
+    daily_streak_points = 0
+
+    # Check for a 7-day streak and award points if found
+    if has_seven_day_streak(entries):
+        daily_streak_points += 10
+
+    return daily_streak_points  # Return daily streak points
@@ -0,0 +1,100 @@
+# Parity between the scoring module and the original per-user calculate_* functions, kept as the
+# reference rules in reference_scoring.py. Both are run over the same seeded random users.
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import app as budget_app
+import database
+import reference_scoring
+import scoring
+
+USERS = 60
+SEED = 20240601
+
+def random_amount(rng):
+    # Mix small amounts, amounts around the 100 boundaries and a few large ones
+    return rng.choice([
+        round(rng.uniform(0.01, 99.99), 2),
+        rng.choice([99.99, 100, 100.01, 199.99, 200, 1000, 1000.01]),
+        round(rng.uniform(100, 5000), 2),
+        float(rng.randint(1, 40) * 100),
+    ])
+
+def random_days(rng, count):
+    # Mostly clustered dates so some users reach 7-day streaks and others fall just short
+    start = date(2024, 1, 1) + timedelta(days=rng.randrange(300))
+    span = rng.choice([6, 8, 14, 60])
+    return [(start + timedelta(days=rng.randrange(span))).isoformat() for _ in range(count)]
+
+@pytest.fixture(scope='module')
+def populated_app(tmp_path_factory):
+    flask_app = budget_app.app
+    original = flask_app.config['DATABASE']
+    flask_app.config['DATABASE'] = str(tmp_path_factory.mktemp('scoring') / 'parity.db')
+    rng = random.Random(SEED)
+
+    with flask_app.app_context():
+        conn = budget_app.get_db_connection()
+        for i in range(USERS):
+            username = f'user{i}'
+            conn.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                         (username, f'{username}@example.com', 'x'))
+            rows = []
+            for day in random_days(rng, rng.randint(0, 25)):
+                if rng.random() < 0.5:
+                    rows.append(('income', day, random_amount(rng), rng.choice(database.INCOME_CATEGORIES)))
+                else:
+                    rows.append(('expenses', day, random_amount(rng), rng.choice(database.EXPENSE_CATEGORIES)))
+            for table, day, amount, category in rows:
+                conn.execute(f'INSERT INTO {table} (username, date, amount, category, description) VALUES (?, ?, ?, ?, ?)',
+                             (username, day, amount, category, ''))
+            conn.commit()
+            # Record activity in insertion order, as the forms do, so out-of-order days exercise the rebuild path
+            for _, day, _, _ in rows:
+                scoring.record_activity(conn, username, day)
+            conn.commit()
+
+    yield flask_app
+    flask_app.config['DATABASE'] = original
+
+def reference_score(username):
+    # achievement_points, total_income and total_expense from the original functions
+    points = (reference_scoring.calculate_income_points(username) +
+              reference_scoring.calculate_expense_points(username) +
+              reference_scoring.calculate_balanced_activity_bonus(username) +
+              reference_scoring.calculate_daily_streak(username))
+    total_income = sum(row['amount'] for row in reference_scoring.fetch_incomes_from_db(username))
+    total_expense = sum(row['amount'] for row in reference_scoring.fetch_expenses_from_db(username))
+    return points, total_income, total_expense
+
+def test_score_user_matches_reference(populated_app):
+    with populated_app.app_context():
+        conn = budget_app.get_db_connection()
+        for i in range(USERS):
+            username = f'user{i}'
+            expected = reference_score(username)
+            assert scoring.score_user(conn, username) == pytest.approx(expected), username
+
+def test_score_all_users_matches_reference(populated_app):
+    with populated_app.app_context():
+        conn = budget_app.get_db_connection()
+        scores = scoring.score_all_users(conn)
+        assert len(scores) == USERS
+        for i in range(USERS):
+            username = f'user{i}'
+            points, total_income, total_expense = reference_score(username)
+            row = scores.loc[username]
+            assert (row['achievement_points'], row['total_income'], row['total_expense']) == \
+                pytest.approx((points, total_income, total_expense)), username
+            assert row['apbadgeid'] == scoring.badge_id(points, scoring.AP_BADGE_THRESHOLDS)
+            assert row['incomebadgeid'] == scoring.badge_id(total_income, scoring.INCOME_BADGE_THRESHOLDS)
+            assert row['expensebadgeid'] == scoring.badge_id(total_expense, scoring.EXPENSE_BADGE_THRESHOLDS)
+
+def test_some_users_reach_a_seven_day_streak(populated_app):
+    # Guards the fixture: the streak bonus must be exercised both ways
+    with populated_app.app_context():
+        bonuses = {reference_scoring.calculate_daily_streak(f'user{i}') for i in range(USERS)}
+    assert bonuses == {0, 10}